@@ -1,49 +1,117 @@
 """Benchmark runner for measuring agent performance."""
 
 import asyncio
+import contextlib
+import dataclasses
 import json
 import time
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn
 
 from .bridge_client import BridgeClient
-from .capture import ScreenCapture
+from .capture import CaptureWorker, ScreenCapture
 from .config import Config
 from .policy import VLMPolicy
 from .protocol import AckMessage, StateMessage
 
+# Per-iteration timing fields, in the column order used by _analyze_results()
+TIMING_COLUMNS = ("t_capture_ms", "t_queue_ms", "t_vlm_ms", "t_ws_send_ms", "end_to_end_ms")
+
+# Full metrics row layout: timestamp (s), the timing columns, then batch size
+METRIC_COLUMNS = ("timestamp", *TIMING_COLUMNS, "batch_size")
+
+
+def compute_stats(timings: np.ndarray) -> list[dict]:
+    """
+    Summarize each column of a (rows, columns) timing array.
+
+    min, p50, p95 and max come from a single np.percentile call, which partitions
+    each column once instead of sorting it; the mean is the only other pass.
+
+    Returns:
+        One dict per column with mean/min/max/p50/p95
+    """
+    mins, p50, p95, maxs = np.percentile(timings, [0, 50, 95, 100], axis=0)
+    means = timings.mean(axis=0)
+    return [
+        {
+            "mean": float(means[i]),
+            "min": float(mins[i]),
+            "max": float(maxs[i]),
+            "p50": float(p50[i]),
+            "p95": float(p95[i]),
+        }
+        for i in range(timings.shape[1])
+    ]
+
 
 class BenchmarkRunner:
     """Runs benchmarks to measure agent performance."""
 
-    def __init__(self, config: Config, duration_seconds: int = 60):
+    def __init__(
+        self,
+        config: Config,
+        duration_seconds: int = 60,
+        batch_max: int = 8,
+        batch_timeout_s: float = 0.02,
+    ):
         """
         Initialize the benchmark runner.
 
         Args:
             config: Agent configuration
             duration_seconds: How long to run the benchmark
+            batch_max: Maximum number of frames sent to the VLM in one batch
+            batch_timeout_s: How long to wait for more frames before sending a partial batch
         """
         self.config = config
         self.duration = duration_seconds
+        self.batch_max = batch_max
+        self.batch_timeout_s = batch_timeout_s
         self.console = Console()
+        self.use_mod_frames = config.capture_mode == "mod"
 
         # Components
-        self.capture = ScreenCapture(
-            mode=config.capture_mode,
-            target_resolution=config.capture_resolution,
-            window_title=config.capture_window_title,
-        )
-        self.policy = VLMPolicy(config)
-        self.bridge = BridgeClient(config.bridge_ws_url)
+        if self.use_mod_frames:
+            # Frames arrive JPEG-encoded from the mod; no local capture/PNG encode needed.
+            self.capture = None
+            self.capture_worker = None
+        else:
+            self.capture = ScreenCapture(
+                mode=config.capture_mode,
+                target_resolution=config.capture_resolution,
+                window_title=config.capture_window_title,
+                jpeg_quality=config.jpeg_quality,
+                use_cuda=config.capture_cuda,
+            )
+            # Capture and encode are paced and run on worker threads
+            self.capture_worker = CaptureWorker(
+                self.capture, config.capture_fps, max_static_s=config.vlm_reuse_ttl_ms / 1000
+            )
+        # Every frame must reach the VLM for the timings to mean anything
+        self.policy = VLMPolicy(dataclasses.replace(config, vlm_reuse_ttl_ms=0))
+        self.bridge = BridgeClient(config.bridge_ws_url, coalesce_ms=config.bridge_coalesce_ms)
 
         # Metrics
-        self.metrics: list[dict] = []
+        # Preallocated metrics rows (see METRIC_COLUMNS); grown if a run outpaces it
+        self.metrics = np.empty(
+            (max(1, duration_seconds * config.capture_fps * 2), len(METRIC_COLUMNS)),
+            dtype=np.float64,
+        )
+        self._metric_count = 0
         self.latest_state: Optional[StateMessage] = None
+        self.latest_frame: Optional[memoryview] = None
+        self.latest_frame_seq: int = -1
+        self._last_queued_seq: int = -1
+        self._frame_ready = asyncio.Event()
         self.acks_received: int = 0
+        self.errors: int = 0
+        self._start_ns = 0
+        self._run_ns = 0
 
     async def run(self):
         """Run the benchmark."""
@@ -53,6 +121,8 @@ class BenchmarkRunner:
         # Set up callbacks
         self.bridge.set_state_callback(self._on_state)
         self.bridge.set_ack_callback(self._on_ack)
+        if self.use_mod_frames:
+            self.bridge.set_frame_callback(self._on_frame)
 
         # Connect to bridge
         try:
@@ -62,12 +132,31 @@ class BenchmarkRunner:
             self.console.print(f"[red]Failed to connect: {e}[/red]")
             return
 
+        # Configure mod frame capture if using mod frames
+        if self.use_mod_frames:
+            capture_every_n = max(1, 60 // self.config.capture_fps)
+            await self.bridge.configure_frames(
+                enabled=True,
+                width=self.config.capture_resolution[0],
+                height=self.config.capture_resolution[1],
+                capture_every_n_frames=capture_every_n,
+                jpeg_quality=self.config.jpeg_quality,
+            )
+
         # Start receiving messages
         receive_task = asyncio.create_task(self.bridge.receive_messages())
+        if self.capture_worker:
+            self.capture_worker.start()
 
-        # Run benchmark with progress display
-        start_time = time.time()
-        end_time = start_time + self.duration
+        # Frames are produced here and consumed in batches by the inference worker
+        request_queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_max)
+        inference_task = asyncio.create_task(self._inference_worker(request_queue))
+
+        # Run benchmark with progress display. All loop timing uses one monotonic
+        # nanosecond clock; wall-clock time is only read for the saved summary.
+        start_ns = time.perf_counter_ns()
+        self._start_ns = start_ns
+        end_ns = start_ns + self.duration * 1_000_000_000
 
         with Progress(
             SpinnerColumn(),
@@ -77,68 +166,155 @@ class BenchmarkRunner:
         ) as progress:
             task = progress.add_task("[cyan]Running benchmark...", total=self.duration)
 
-            while time.time() < end_time:
-                await self._run_iteration(start_time)
-                progress.update(task, completed=time.time() - start_time)
-                await asyncio.sleep(0.01)  # Small sleep to prevent tight loop
-
-        # Clean up
+            while True:
+                iteration_start = time.perf_counter_ns()
+                if iteration_start >= end_ns:
+                    break
+
+                if self.use_mod_frames:
+                    # The mod paces frames itself; wake only when a new one arrives
+                    try:
+                        await asyncio.wait_for(
+                            self._frame_ready.wait(), timeout=(end_ns - iteration_start) * 1e-9
+                        )
+                    except asyncio.TimeoutError:
+                        continue
+                    self._frame_ready.clear()
+                else:
+                    # The capture worker paces frames; wait in a thread for the next one
+                    ready = await asyncio.to_thread(
+                        self.capture_worker.frame_ready.wait, (end_ns - iteration_start) * 1e-9
+                    )
+                    if not ready:
+                        continue
+                    self.capture_worker.frame_ready.clear()
+
+                try:
+                    await self._run_iteration(request_queue)
+                except Exception as e:
+                    self.errors += 1
+                    self.console.print(f"[red]Error in iteration: {e}[/red]")
+                now = time.perf_counter_ns()
+                progress.update(task, completed=(now - start_ns) * 1e-9)
+
+        self._run_ns = time.perf_counter_ns() - start_ns
+
+        # Clean up: let cancelled tasks unwind before the clients they use are closed
+        inference_task.cancel()
         receive_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await inference_task
+        with contextlib.suppress(asyncio.CancelledError):
+            await receive_task
         await self.bridge.close()
-        self.capture.close()
-        self.policy.close()
+        if self.capture_worker:
+            self.capture_worker.stop()
+            self.errors += self.capture_worker.errors
+        if self.capture:
+            self.capture.close()
+        await self.policy.close()
 
         # Analyze and display results
         self._analyze_results()
 
-    async def _run_iteration(self, benchmark_start: float):
-        """Execute one benchmark iteration."""
-        try:
-            # Capture frame
-            t0 = time.perf_counter()
-            frame = self.capture.capture_frame()
-            t1 = time.perf_counter()
-            t_capture_ms = (t1 - t0) * 1000
-
-            # Convert to data URL
-            image_data_url = self.capture.frame_to_png_base64(frame)
-
-            # Get action from VLM
-            t2 = time.perf_counter()
-            # Offload sync HTTP to avoid blocking receive_messages() background task.
-            action = await asyncio.to_thread(
-                self.policy.get_action, image_data_url, "benchmark test", None
-            )
-            t3 = time.perf_counter()
-            t_vlm_ms = (t3 - t2) * 1000
-
-            # Send to bridge
-            t4 = time.perf_counter()
-            await self.bridge.send_action(action)
-            t5 = time.perf_counter()
-            t_ws_send_ms = (t5 - t4) * 1000
-
-            # Calculate end-to-end time (capture + VLM + send)
-            end_to_end_ms = t_capture_ms + t_vlm_ms + t_ws_send_ms
-
-            # Record metrics
-            self.metrics.append(
-                {
-                    "timestamp": time.time() - benchmark_start,
-                    "t_capture_ms": t_capture_ms,
-                    "t_vlm_ms": t_vlm_ms,
-                    "t_ws_send_ms": t_ws_send_ms,
-                    "end_to_end_ms": end_to_end_ms,
-                }
-            )
+    async def _run_iteration(self, request_queue: asyncio.Queue):
+        """
+        Take the newest frame and enqueue it for batched inference.
 
-        except Exception as e:
-            self.console.print(f"[red]Error in iteration: {e}[/red]")
+        Exceptions propagate to the caller, which counts and reports them.
+        """
+        # Capture frame
+        t0 = time.perf_counter_ns()
+        if self.use_mod_frames:
+            if self.latest_frame is None or self.latest_frame_seq == self._last_queued_seq:
+                # No new frame from the mod yet, skip this iteration
+                return
+            self._last_queued_seq = self.latest_frame_seq
+            # Mod frames are already JPEG and go to the policy as-is
+            jpeg_bytes = self.latest_frame
+            t1 = time.perf_counter_ns()
+            t_capture_ms = (t1 - t0) * 1e-6
+        else:
+            latest = self.capture_worker.latest_frame()
+            if latest is None or latest[0] == self._last_queued_seq:
+                return
+            # Capture and encode already happened on the worker threads
+            self._last_queued_seq, jpeg_bytes, t_capture_ns = latest
+            t_capture_ms = t_capture_ns * 1e-6
+            t1 = time.perf_counter_ns()
+
+        # Blocks while the queue is full, so capture never runs far ahead of inference
+        await request_queue.put((t1, t_capture_ms, jpeg_bytes))
+
+    async def _inference_worker(self, request_queue: asyncio.Queue):
+        """
+        Drain queued frames in batches and run them through the VLM together.
+
+        Waits for at least one request, then keeps collecting until either
+        `batch_max` requests are queued or `batch_timeout_s` passes without a new one.
+        """
+        while True:
+            batch = [await request_queue.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(
+                        await asyncio.wait_for(request_queue.get(), timeout=self.batch_timeout_s)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                # Get actions from VLM
+                t2 = time.perf_counter_ns()
+                actions = await self.policy.get_actions_batch(
+                    [jpeg_bytes for _, _, jpeg_bytes in batch], "benchmark test", None
+                )
+                t3 = time.perf_counter_ns()
+                t_vlm_ms = (t3 - t2) * 1e-6
+
+                for (t_queued, t_capture_ms, _), action in zip(batch, actions):
+                    # Send to bridge; each send starts where the previous one ended
+                    await self.bridge.send_action(action)
+                    t4 = time.perf_counter_ns()
+                    t_ws_send_ms = (t4 - t3) * 1e-6
+                    t3 = t4
+                    t_queue_ms = (t2 - t_queued) * 1e-6
+
+                    # Calculate end-to-end time (capture + queue wait + VLM + send)
+                    end_to_end_ms = t_capture_ms + t_queue_ms + t_vlm_ms + t_ws_send_ms
+
+                    # Record metrics
+                    self._record_metrics(
+                        (t4 - self._start_ns) * 1e-9,
+                        t_capture_ms,
+                        t_queue_ms,
+                        t_vlm_ms,
+                        t_ws_send_ms,
+                        end_to_end_ms,
+                        len(batch),
+                    )
+
+            except Exception as e:
+                self.errors += 1
+                self.console.print(f"[red]Error in inference batch: {e}[/red]")
+
+    def _record_metrics(self, *row: float):
+        """Store one metrics row (ordered as METRIC_COLUMNS) in the preallocated buffer."""
+        if self._metric_count == len(self.metrics):
+            self.metrics = np.concatenate([self.metrics, np.empty_like(self.metrics)])
+        self.metrics[self._metric_count] = row
+        self._metric_count += 1
 
     def _on_state(self, state: StateMessage):
         """Callback for state updates."""
         self.latest_state = state
 
+    def _on_frame(self, frame_data: memoryview, seq: int, ts: int):
+        """Callback for frame updates from mod."""
+        self.latest_frame = frame_data
+        self.latest_frame_seq = seq
+        self._frame_ready.set()
+
     def _on_ack(self, ack: AckMessage):
         """Callback for action acknowledgments."""
         # Track acks received regardless of success, since this is primarily a
@@ -147,57 +323,53 @@ class BenchmarkRunner:
 
     def _analyze_results(self):
         """Analyze and display benchmark results."""
-        if not self.metrics:
+        if not self._metric_count:
             self.console.print("[red]No metrics collected[/red]")
             return
 
-        complete_metrics = self.metrics
-
-        # Calculate statistics
-        n = len(complete_metrics)
-        capture_times = [m["t_capture_ms"] for m in complete_metrics]
-        vlm_times = [m["t_vlm_ms"] for m in complete_metrics]
-        send_times = [m["t_ws_send_ms"] for m in complete_metrics]
-        e2e_times = [m["end_to_end_ms"] for m in complete_metrics]
-
-        def calc_stats(values):
-            if not values:
-                return {"mean": 0, "min": 0, "max": 0, "p50": 0, "p95": 0}
-            sorted_vals = sorted(values)
-            return {
-                "mean": sum(values) / len(values),
-                "min": min(values),
-                "max": max(values),
-                "p50": sorted_vals[len(sorted_vals) // 2],
-                "p95": sorted_vals[int(len(sorted_vals) * 0.95)],
-            }
-
-        capture_stats = calc_stats(capture_times)
-        vlm_stats = calc_stats(vlm_times)
-        send_stats = calc_stats(send_times)
-        e2e_stats = calc_stats(e2e_times)
-
-        # Calculate effective Hz
-        effective_hz = 1000.0 / e2e_stats["mean"] if e2e_stats["mean"] > 0 else 0
+        complete_metrics = self.metrics[: self._metric_count]
+
+        # Calculate statistics over all timing columns at once
+        timings = complete_metrics[:, 1 : 1 + len(TIMING_COLUMNS)]
+        capture_stats, queue_stats, vlm_stats, send_stats, e2e_stats = compute_stats(timings)
+        e2e_times = timings[:, -1]
+
+        # Requests are queued, batched and overlapped, so the decision rate is
+        # completed decisions per wall-clock second, not 1 / mean latency
+        run_s = self._run_ns * 1e-9
+        effective_hz = self._metric_count / run_s if run_s > 0 else 0.0
 
         # Display results
         self.console.print("\n[cyan]Benchmark Results:[/cyan]\n")
-        self.console.print(f"Total iterations: {len(self.metrics)}")
-        self.console.print(f"Acks received: {self.acks_received}\n")
+        self.console.print(f"Total iterations: {self._metric_count}")
+        self.console.print(f"Acks received: {self.acks_received}")
+        self.console.print(f"Errors: {self.errors}")
+        mean_batch = complete_metrics[:, -1].mean()
+        self.console.print(f"Mean batch size: {mean_batch:.2f}\n")
 
         self.console.print("[yellow]Capture times (ms):[/yellow]")
         self._print_stats(capture_stats)
 
+        self.console.print("\n[yellow]Queue wait times (ms):[/yellow]")
+        self._print_stats(queue_stats)
+
         self.console.print("\n[yellow]VLM inference times (ms):[/yellow]")
         self._print_stats(vlm_stats)
 
         self.console.print("\n[yellow]WebSocket send times (ms):[/yellow]")
         self._print_stats(send_stats)
 
-        if e2e_times:
+        if e2e_times.size:
             self.console.print("\n[yellow]End-to-end times (ms):[/yellow]")
             self._print_stats(e2e_stats)
-            self.console.print(f"\n[green]Effective Hz: {effective_hz:.2f}[/green]")
+            self.console.print(
+                f"\n[green]Effective Hz: {effective_hz:.2f} "
+                f"({self._metric_count} decisions in {run_s:.1f}s)[/green]"
+            )
+            self.console.print(
+                f"[green]Latency P50/P95: {e2e_stats['p50']:.1f} / "
+                f"{e2e_stats['p95']:.1f} ms[/green]"
+            )
 
             # Check acceptance criteria
             self._check_acceptance_criteria(e2e_stats, effective_hz)
@@ -225,7 +397,7 @@ class BenchmarkRunner:
         else:
             self.console.print("[red]✗ FAIL: Does not meet latency/Hz criteria[/red]")
 
-    def _save_results(self, metrics: list[dict], e2e_stats: dict, effective_hz: float):
+    def _save_results(self, metrics: np.ndarray, e2e_stats: dict, effective_hz: float):
         """Save results to JSONL file."""
         log_dir = Path(__file__).parent.parent.parent / "logs"
         log_dir.mkdir(exist_ok=True)
@@ -235,14 +407,18 @@ class BenchmarkRunner:
         summary = {
             "timestamp": time.time(),
             "duration_seconds": self.duration,
-            "total_iterations": len(self.metrics),
+            "total_iterations": self._metric_count,
             "complete_measurements": len(metrics),
+            "errors": self.errors,
             "e2e_stats_ms": e2e_stats,
             "effective_hz": effective_hz,
             "config": {
                 "capture_fps": self.config.capture_fps,
                 "decision_hz": self.config.decision_hz,
                 "max_new_tokens": self.config.max_new_tokens,
+                "vlm_precision": self.config.vlm_precision,
+                "capture_mode": self.config.capture_mode,
+                "batch_max": self.batch_max,
             },
         }
 
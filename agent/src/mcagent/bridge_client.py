@@ -1,44 +1,90 @@
 """WebSocket client for communicating with the Minecraft bridge mod."""
 
+import asyncio
 import json
+import logging
 import struct
 import time
 from typing import Optional, Callable
 
 import websockets
+from pydantic import ValidationError
 from websockets.client import WebSocketClientProtocol
 
 from .protocol import (
+    INBOUND_ADAPTER,
     ActionMessage,
     AckMessage,
     StateMessage,
+    encode_action,
 )
 
+logger = logging.getLogger(__name__)
+
 # Binary message types from mod
 MSG_TYPE_FRAME = 0x01
 
+# Binary frame header: type(1) + seq(4) + ts(4), big-endian
+_FRAME_HEADER = struct.Struct(">BII")
+
+# Flush the coalescing buffer early once this many actions are pending
+COALESCE_MAX_PENDING = 8
+
+# Text messages buffered between the socket reader and the parsing worker
+MESSAGE_QUEUE_SIZE = 64
+
 
 class BridgeClient:
     """WebSocket client for the Minecraft bridge."""
 
-    def __init__(self, ws_url: str):
-        """Initialize the bridge client."""
+    def __init__(self, ws_url: str, coalesce_ms: int = 0):
+        """
+        Initialize the bridge client.
+
+        Args:
+            ws_url: WebSocket URL of the bridge
+            coalesce_ms: If > 0, buffer outgoing actions and flush them as one JSON
+                array frame every `coalesce_ms` milliseconds (requires bridge support)
+        """
         self.ws_url = ws_url
+        self.coalesce_ms = coalesce_ms
         self.ws: Optional[WebSocketClientProtocol] = None
         self.connected = False
         self.capabilities = {}
         self.latest_state: Optional[StateMessage] = None
         self._on_state_callback: Optional[Callable[[StateMessage], None]] = None
         self._on_ack_callback: Optional[Callable[[AckMessage], None]] = None
-        self._on_frame_callback: Optional[Callable[[bytes, int, int], None]] = None
-        self._last_send_time = 0.0
+        self._on_frame_callback: Optional[Callable[[memoryview, int, int], None]] = None
+        self._on_sent_callback: Optional[Callable[[int, int], None]] = None
+        self._last_send_ns = 0
         self._frames_logged = 0
 
+        # Outgoing action coalescing
+        self._send_buf: list[bytes] = []
+        self._send_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Uncoalesced sends: every action goes through one queue drained by a single
+        # writer task, so awaited and fire-and-forget sends reach the wire in order.
+        # Items are (payload, future resolved with the result or None).
+        self._send_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+
         # Frame state
-        self.latest_frame: Optional[bytes] = None
+        self.latest_frame: Optional[memoryview] = None
         self.latest_frame_seq: int = 0
         self.latest_frame_ts: int = 0
 
+        # Latest-wins dispatch: frames/states that arrive in a burst overwrite each
+        # other here and only the newest one is handled once the burst is drained.
+        self._pending_frame: Optional[bytes] = None
+        self._pending_state: Optional[StateMessage] = None
+        self._dispatch_scheduled = False
+        self.frames_received = 0
+        self.frames_dropped = 0
+
+        # JSON messages are parsed by a worker task, not by the socket reader
+        self._msg_queue: Optional[asyncio.Queue] = None
+
     async def connect(self) -> bool:
         """
         Connect to the Minecraft bridge WebSocket server.
@@ -50,7 +96,9 @@ class BridgeClient:
             # Keep ping/pong enabled; with the agent now avoiding event-loop blocking,
             # this should remain healthy. Keeping defaults is fine, but we log close
             # reasons more explicitly in receive_messages().
-            self.ws = await websockets.connect(self.ws_url)
+            # No permessage-deflate: messages are small JSON actions/state plus
+            # already-compressed JPEG frames, so per-message zlib only adds latency.
+            self.ws = await websockets.connect(self.ws_url, compression=None)
             self.connected = True
 
             # Set default capabilities (the mod doesn't implement hello protocol)
@@ -60,6 +108,13 @@ class BridgeClient:
                 "supports_chat_cmd": False,
             }
 
+            if self.coalesce_ms > 0:
+                self._send_event = asyncio.Event()
+                self._flush_task = asyncio.create_task(self._flush_loop())
+            else:
+                self._send_queue = asyncio.Queue()
+                self._writer_task = asyncio.create_task(self._write_loop())
+
             return True
 
         except Exception as e:
@@ -79,15 +134,93 @@ class BridgeClient:
         if not self.connected or not self.ws:
             return False
 
-        start = time.perf_counter()
+        if self._send_event is not None:
+            self._buffer_action(action)
+            return True
+
+        # Queued behind any earlier send_action_nowait() actions
+        sent = asyncio.get_running_loop().create_future()
+        self._send_queue.put_nowait((encode_action(action), sent))
+        return await sent
+
+    def send_action_nowait(self, action: ActionMessage) -> bool:
+        """
+        Queue an action for sending without waiting for the socket write.
+
+        With coalescing enabled the action joins the next batched frame; otherwise
+        it is queued for the writer task. Either way actions go out in call order.
+
+        Args:
+            action: The action to send
+
+        Returns:
+            True if the action was queued
+        """
+        if not self.connected or not self.ws:
+            return False
 
+        if self._send_event is not None:
+            self._buffer_action(action)
+        else:
+            self._send_queue.put_nowait((encode_action(action), None))
+        return True
+
+    async def _write_loop(self):
+        """Send queued actions one at a time. Runs as a background task."""
+        while True:
+            payload, sent = await self._send_queue.get()
+            try:
+                ok = await self._write(payload, 1)
+                if sent is not None and not sent.done():
+                    sent.set_result(ok)
+            finally:
+                self._send_queue.task_done()
+
+    async def _write(self, payload: bytes, count: int) -> bool:
+        """Write one text frame carrying `count` actions and record its timing."""
+        start = time.perf_counter_ns()
         try:
-            await self.ws.send(action.model_dump_json())
-            self._last_send_time = time.perf_counter() - start
-            return True
+            # Serialized straight to UTF-8 bytes; text=True keeps it a text frame
+            await self.ws.send(payload, text=True)
         except Exception as e:
-            print(f"Error sending action: {e}")
+            logger.error("Error sending %d action(s): %s", count, e)
             return False
+        self._last_send_ns = time.perf_counter_ns() - start
+        if self._on_sent_callback:
+            try:
+                self._on_sent_callback(count, self._last_send_ns)
+            except Exception as e:
+                logger.error("Error in sent callback: %s", e)
+        return True
+
+    def _buffer_action(self, action: ActionMessage):
+        """Add an action to the coalescing buffer, flushing early once it fills up."""
+        # Coalescing: queue the action and let _flush_loop() send it
+        self._send_buf.append(encode_action(action))
+        if len(self._send_buf) >= COALESCE_MAX_PENDING:
+            self._send_event.set()
+
+    async def _flush_loop(self):
+        """Periodically flush coalesced actions. Runs as a background task."""
+        interval = self.coalesce_ms / 1000
+        while self.connected:
+            try:
+                await asyncio.wait_for(self._send_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._send_event.clear()
+            await self._flush_send_buffer()
+
+    async def _flush_send_buffer(self):
+        """Send all buffered actions in a single WebSocket frame."""
+        if not self._send_buf or not self.ws:
+            return
+
+        pending, self._send_buf = self._send_buf, []
+        # A lone action goes out unchanged; several are wrapped in a JSON array
+        payload = pending[0] if len(pending) == 1 else b"[" + b",".join(pending) + b"]"
+
+        await self._write(payload, len(pending))
 
     async def receive_messages(self):
         """
@@ -98,45 +231,89 @@ class BridgeClient:
         if not self.ws:
             return
 
-        print("[DEBUG] Starting to receive messages...")
+        logger.debug("Starting to receive messages...")
+        # Parsing/validation happens in a separate task so the reader only moves bytes
+        self._msg_queue = asyncio.Queue(maxsize=MESSAGE_QUEUE_SIZE)
+        worker = asyncio.create_task(self._process_messages(self._msg_queue))
         try:
             async for message in self.ws:
                 if isinstance(message, bytes):
-                    try:
-                        self._handle_binary_message(message)
-                    except Exception as e:
-                        # Never let a bad frame kill the receive loop.
-                        print(f"[DEBUG] Error handling binary message ({len(message)} bytes): {e}")
+                    self.frames_received += 1
+                    if self._pending_frame is not None:
+                        self.frames_dropped += 1
+                    self._pending_frame = message
+                    self._schedule_dispatch()
                 else:
-                    await self._handle_message(message)
+                    await self._msg_queue.put(message)
         except websockets.exceptions.ConnectionClosed as e:
             # Includes code/reason which helps debug disconnects initiated by either side.
-            print(f"[DEBUG] WebSocket connection closed (code={e.code}, reason={e.reason})")
+            logger.warning("WebSocket connection closed (code=%s, reason=%s)", e.code, e.reason)
             self.connected = False
         except Exception as e:
-            print(f"[DEBUG] Error receiving messages: {e}")
+            logger.error("Error receiving messages: %s", e)
             self.connected = False
+        finally:
+            worker.cancel()
+
+    async def _process_messages(self, queue: asyncio.Queue):
+        """Parse and dispatch queued text messages. Runs alongside receive_messages()."""
+        while True:
+            message = await queue.get()
+            await self._handle_message(message)
+
+    def _schedule_dispatch(self):
+        """
+        Arrange for the newest pending frame/state to be handled.
+
+        The callback only runs once the receive loop yields to the event loop, i.e.
+        after every message already buffered by the connection has been read, so a
+        backlog collapses into a single dispatch of the most recent data.
+        """
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            asyncio.get_running_loop().call_soon(self._dispatch_latest)
+
+    def _dispatch_latest(self):
+        """Handle the newest pending frame and state, discarding older ones."""
+        self._dispatch_scheduled = False
+
+        frame, self._pending_frame = self._pending_frame, None
+        if frame is not None:
+            try:
+                self._handle_binary_message(frame)
+            except Exception as e:
+                # Never let a bad frame kill the receive loop.
+                logger.warning("Error handling binary message (%d bytes): %s", len(frame), e)
+
+        state, self._pending_state = self._pending_state, None
+        if state is not None:
+            try:
+                self.latest_state = state
+                if self._on_state_callback:
+                    self._on_state_callback(state)
+            except Exception as e:
+                logger.error("Error handling state message: %s", e)
 
     def _handle_binary_message(self, data: bytes):
         """Handle a binary WebSocket message (frames)."""
-        if len(data) < 9:
-            print(f"[DEBUG] Received binary message too short: {len(data)} bytes")
+        if len(data) < _FRAME_HEADER.size:
+            logger.debug("Received binary message too short: %d bytes", len(data))
             return
 
-        msg_type = data[0]
+        msg_type, seq, ts = _FRAME_HEADER.unpack_from(data)
         if msg_type == MSG_TYPE_FRAME:
-            # Parse header: type(1) + seq(4) + ts(4) + jpeg_data
-            seq, ts = struct.unpack(">II", data[1:9])
-            frame_data = data[9:]
+            # JPEG payload follows the header; expose it as a view to avoid a copy
+            frame_data = memoryview(data)[_FRAME_HEADER.size :]
 
             self.latest_frame = frame_data
             self.latest_frame_seq = seq
             self.latest_frame_ts = ts
 
             # Lightweight periodic logging to confirm ongoing stream without spamming.
-            self._frames_logged += 1
-            if self._frames_logged <= 3 or self._frames_logged % 60 == 0:
-                print(f"[DEBUG] Frame received: seq={seq} ts={ts} bytes={len(frame_data)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                self._frames_logged += 1
+                if self._frames_logged <= 3 or self._frames_logged % 60 == 0:
+                    logger.debug("Frame received: seq=%d ts=%d bytes=%d", seq, ts, len(frame_data))
 
             if self._on_frame_callback:
                 self._on_frame_callback(frame_data, seq, ts)
@@ -144,22 +321,35 @@ class BridgeClient:
     async def _handle_message(self, message: str):
         """Handle an incoming message from the bridge."""
         try:
-            data = json.loads(message)
-            msg_type = data.get("type")
+            msg = INBOUND_ADAPTER.validate_json(message)
+        except ValidationError as e:
+            if e.errors()[0]["type"] not in ("union_tag_invalid", "union_tag_not_found"):
+                logger.error("Error handling message: %s", e)
+            # Otherwise a message type the agent does not consume (e.g. hello)
+            return
 
-            if msg_type == "ack":
-                ack = AckMessage.model_validate(data)
+        try:
+            if isinstance(msg, AckMessage):
                 if self._on_ack_callback:
-                    self._on_ack_callback(ack)
+                    self._on_ack_callback(msg)
 
-            elif msg_type == "state":
-                state = StateMessage.model_validate(data)
-                self.latest_state = state
-                if self._on_state_callback:
-                    self._on_state_callback(state)
+            else:
+                # Dispatched from _dispatch_latest() so superseded states are skipped
+                self._pending_state = msg
+                self._schedule_dispatch()
 
         except Exception as e:
-            print(f"Error handling message: {e}")
+            logger.error("Error handling message: %s", e)
+
+    def set_sent_callback(self, callback: Callable[[int, int], None]):
+        """
+        Set callback for completed socket writes.
+
+        Args:
+            callback: Function receiving (action_count: int, send_time_ns: int) after
+                each frame is written; coalesced frames carry several actions.
+        """
+        self._on_sent_callback = callback
 
     def set_state_callback(self, callback: Callable[[StateMessage], None]):
         """Set callback for state updates."""
@@ -169,32 +359,40 @@ class BridgeClient:
         """Set callback for acknowledgments."""
         self._on_ack_callback = callback
 
-    def set_frame_callback(self, callback: Callable[[bytes, int, int], None]):
+    def set_frame_callback(self, callback: Callable[[memoryview, int, int], None]):
         """
         Set callback for frame updates.
 
         Args:
-            callback: Function receiving (frame_data: bytes, sequence: int, timestamp: int)
+            callback: Function receiving (frame_data: memoryview, sequence: int, timestamp: int).
+                frame_data is a zero-copy view of the JPEG bytes; any bytes-like consumer
+                (base64, file writes, image decoders) accepts it directly.
         """
         self._on_frame_callback = callback
 
     async def configure_frames(
         self,
         enabled: bool = True,
-        width: int = 854,
-        height: int = 480,
+        width: int = 448,
+        height: int = 252,
         capture_every_n_frames: int = 1,
-        jpeg_quality: float = 0.75,
+        jpeg_quality: float = 0.6,
+        color_subsampling: str = "4:2:0",
     ):
         """
         Configure frame capture settings on the mod.
 
+        The defaults target what the VLM actually consumes: a 16:9 frame whose sides
+        are multiples of the 14px ViT patch size, at a quality where JPEG artifacts
+        are not visible after the model's own downscaling.
+
         Args:
             enabled: Whether frame capture is enabled
             width: Target frame width
             height: Target frame height
             capture_every_n_frames: Capture every N frames (1 = every frame, 2 = every other)
             jpeg_quality: JPEG compression quality (0.0 to 1.0)
+            color_subsampling: JPEG chroma subsampling ("4:4:4", "4:2:2" or "4:2:0")
         """
         if not self.connected or not self.ws:
             return
@@ -206,17 +404,31 @@ class BridgeClient:
             "height": height,
             "captureEveryNFrames": capture_every_n_frames,
             "jpegQuality": jpeg_quality,
+            "colorSubsampling": color_subsampling,
         }
         config_json = json.dumps(config)
-        print(f"[DEBUG] Sending frame config: {config_json}")
+        logger.debug("Sending frame config: %s", config_json)
         await self.ws.send(config_json)
 
+    def get_last_send_time_ns(self) -> int:
+        """Get the time taken for the last send in nanoseconds."""
+        return self._last_send_ns
+
     def get_last_send_time_ms(self) -> float:
         """Get the time taken for the last send in milliseconds."""
-        return self._last_send_time * 1000
+        return self._last_send_ns * 1e-6
 
     async def close(self):
         """Close the WebSocket connection."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+            await self._flush_send_buffer()
+        if self._writer_task:
+            # Let already-queued actions go out before closing
+            await self._send_queue.join()
+            self._writer_task.cancel()
+            self._writer_task = None
         if self.ws:
             await self.ws.close()
             self.connected = False
@@ -224,7 +436,7 @@ class BridgeClient:
     @staticmethod
     def _get_timestamp_ms() -> int:
         """Get current timestamp in milliseconds."""
-        return int(time.time() * 1000)
+        return time.time_ns() // 1_000_000
 
     async def __aenter__(self):
         """Async context manager entry."""
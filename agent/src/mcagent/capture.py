@@ -3,16 +3,58 @@
 import base64
 import json
 import os
+import re
 import subprocess
+import sys
+import threading
 import time
+import warnings
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Literal, Optional
+from typing import Callable, Literal, Optional
 
 import cv2
 import mss
 import numpy as np
 from PIL import Image
 
+if sys.platform == "win32":
+    import mss.windows
+
+    # Plain BitBlt without layered-window blending: much faster grabs, no cursor flicker
+    mss.windows.CAPTUREBLT = 0
+
+# SIMD-accelerated base64 (falls back to the stdlib encoder)
+try:
+    import pybase64
+    HAS_PYBASE64 = True
+except ImportError:
+    HAS_PYBASE64 = False
+
+# SIMD JPEG encoding via libjpeg-turbo (falls back to cv2.imencode)
+try:
+    from turbojpeg import TJPF_BGR, TJSAMP_420, TurboJPEG
+    HAS_TURBOJPEG = True
+except ImportError:
+    HAS_TURBOJPEG = False
+
+# Wayland ScreenCast portal over D-Bus (frames are then read from PipeWire)
+try:
+    from jeepney import DBusAddress, MatchRule, new_method_call
+    from jeepney.bus_messages import message_bus
+    from jeepney.io.blocking import open_dbus_connection
+    HAS_JEEPNEY = True
+except ImportError:
+    HAS_JEEPNEY = False
+
+# SIMD hashing for duplicate-frame detection (falls back to zlib.crc32)
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
 try:
     import pyscreenshot as ImageGrab
     HAS_PYSCREENSHOT = True
@@ -34,6 +76,185 @@ try:
 except ImportError:
     HAS_XLIB = False
 
+b64encode = pybase64.b64encode if HAS_PYBASE64 else base64.b64encode
+frame_digest = xxhash.xxh3_64_intdigest if HAS_XXHASH else zlib.crc32
+
+# Data URL headers, prepended to the base64 payload as bytes
+JPEG_DATA_URL_PREFIX = b"data:image/jpeg;base64,"
+PNG_DATA_URL_PREFIX = b"data:image/png;base64,"
+
+
+def jpeg_to_data_url(jpeg_bytes: bytes | memoryview) -> str:
+    """
+    Wrap already-encoded JPEG bytes in a base64 data URL.
+
+    Args:
+        jpeg_bytes: JPEG data, e.g. a zero-copy view of a frame received from the mod
+
+    Returns:
+        Base64-encoded JPEG data URL
+    """
+    return (JPEG_DATA_URL_PREFIX + b64encode(memoryview(jpeg_bytes))).decode("ascii")
+
+
+def yuv420_to_bgr(
+    yuv_data: bytes | memoryview, width: int, height: int, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Convert a raw planar YUV 4:2:0 (I420) frame to BGR.
+
+    For frames that arrive as raw planes rather than JPEG, this skips JPEG
+    entropy decoding entirely. OpenCV's SIMD conversion handles the per-2x2-block
+    chroma math.
+
+    Args:
+        yuv_data: Y plane followed by the U and V planes (width * height * 3 / 2 bytes)
+        width: Frame width (even)
+        height: Frame height (even)
+        out: Optional (height, width, 3) uint8 array to write into
+
+    Returns:
+        BGR numpy array
+    """
+    planes = np.frombuffer(yuv_data, dtype=np.uint8).reshape(height * 3 // 2, width)
+    return cv2.cvtColor(planes, cv2.COLOR_YUV2BGR_I420, dst=out)
+
+
+# How long a detected window region is trusted before it is looked up again
+WINDOW_REGION_TTL_S = 3.0
+
+# Upper bound on a single wmctrl/xdotool call during window lookup
+WINDOW_QUERY_TIMEOUT_S = 0.5
+
+# How long to wait for a portal response (Start shows a source picker to the user)
+PORTAL_TIMEOUT_S = 120
+
+
+class PipeWireCapture:
+    """
+    Wayland capture through the XDG ScreenCast portal and PipeWire.
+
+    The portal hands out a PipeWire stream for the monitor or window the user picks,
+    and an OpenCV GStreamer pipeline reads frames from it. This avoids spawning a
+    screenshot helper for every frame like pyscreenshot does.
+    """
+
+    def __init__(self, source: Literal["screen", "window"] = "screen"):
+        """
+        Start a ScreenCast session and open its PipeWire stream.
+
+        Args:
+            source: 'screen' to offer monitors in the portal picker, 'window' for windows
+
+        Raises:
+            RuntimeError: If the portal, PipeWire or GStreamer support is unavailable
+        """
+        if not HAS_JEEPNEY:
+            raise RuntimeError("jeepney is not installed. Install with: pip install jeepney")
+        if not re.search(r"GStreamer:\s*YES", cv2.getBuildInformation()):
+            raise RuntimeError("OpenCV was built without GStreamer support")
+
+        self._portal = DBusAddress(
+            "/org/freedesktop/portal/desktop",
+            bus_name="org.freedesktop.portal.Desktop",
+            interface="org.freedesktop.portal.ScreenCast",
+        )
+        self._request_count = 0
+        self._fd: Optional[int] = None
+        self._cap: Optional[cv2.VideoCapture] = None
+        # The session lives as long as this connection stays open
+        self._conn = open_dbus_connection(bus="SESSION", enable_fds=True)
+
+        try:
+            node_id = self._start_session(source)
+            pipeline = (
+                f"pipewiresrc fd={self._fd} path={node_id} ! videoconvert ! "
+                "video/x-raw,format=BGR ! appsink max-buffers=1 drop=true sync=false"
+            )
+            self._cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+            if not self._cap.isOpened():
+                raise RuntimeError("Could not open PipeWire stream")
+        except Exception:
+            self.close()
+            raise
+
+    def _request(self, method: str, signature: str, args: tuple, options: dict) -> dict:
+        """Call a portal method and wait for its Request.Response signal."""
+        self._request_count += 1
+        token = f"mcagent{self._request_count}"
+        sender = self._conn.unique_name.lstrip(":").replace(".", "_")
+        rule = MatchRule(
+            type="signal",
+            interface="org.freedesktop.portal.Request",
+            member="Response",
+            path=f"/org/freedesktop/portal/desktop/request/{sender}/{token}",
+        )
+        self._conn.send_and_get_reply(message_bus.AddMatch(rule), unwrap=True)
+
+        options = {**options, "handle_token": ("s", token)}
+        with self._conn.filter(rule) as responses:
+            self._conn.send_and_get_reply(
+                new_method_call(self._portal, method, signature, (*args, options)),
+                unwrap=True,
+            )
+            code, results = self._conn.recv_until_filtered(
+                responses, timeout=PORTAL_TIMEOUT_S
+            ).body
+
+        if code != 0:
+            raise RuntimeError(f"ScreenCast {method} was cancelled or denied (code {code})")
+        return results
+
+    def _start_session(self, source: str) -> int:
+        """Negotiate a ScreenCast session and return the PipeWire node to read from."""
+        results = self._request(
+            "CreateSession", "a{sv}", (), {"session_handle_token": ("s", "mcagent")}
+        )
+        session = results["session_handle"][1]
+
+        self._request(
+            "SelectSources",
+            "oa{sv}",
+            (session,),
+            {
+                "types": ("u", 2 if source == "window" else 1),
+                "multiple": ("b", False),
+                "cursor_mode": ("u", 1),  # hidden
+            },
+        )
+
+        results = self._request("Start", "osa{sv}", (session, ""), {})
+        node_id = results["streams"][1][0][0]
+
+        (fd,) = self._conn.send_and_get_reply(
+            new_method_call(self._portal, "OpenPipeWireRemote", "oa{sv}", (session, {})),
+            unwrap=True,
+        )
+        self._fd = fd.to_raw_fd()
+        return node_id
+
+    def read(self) -> np.ndarray:
+        """
+        Read the newest frame from the stream.
+
+        Returns:
+            numpy array of the frame in BGR format
+        """
+        ok, frame = self._cap.read()
+        if not ok:
+            raise RuntimeError("PipeWire stream returned no frame")
+        return frame
+
+    def close(self):
+        """Stop the stream and end the ScreenCast session."""
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._conn.close()
+
 
 class ScreenCapture:
     """Captures screenshots from the screen or a specific window."""
@@ -41,9 +262,11 @@ class ScreenCapture:
     def __init__(
         self,
         mode: Literal["screen", "window"] = "screen",
-        target_resolution: tuple[int, int] = (854, 480),
+        target_resolution: tuple[int, int] = (384, 216),
         monitor_index: int = 1,
         window_title: str = "Minecraft",
+        jpeg_quality: float = 0.5,
+        use_cuda: bool = False,
     ):
         """
         Initialize the screen capture.
@@ -53,33 +276,73 @@ class ScreenCapture:
             target_resolution: Target resolution (width, height) for captured frames
             monitor_index: Monitor index to capture from (1-indexed)
             window_title: Window title to search for when mode='window' (case-insensitive substring match)
+            jpeg_quality: JPEG compression quality (0.0 to 1.0) used by frame_to_jpeg_base64
+            use_cuda: Resize and color-convert on the GPU via OpenCV's CUDA module
         """
         self.mode = mode
         self.target_resolution = target_resolution
         self.monitor_index = monitor_index
         self.window_title = window_title
+        self.jpeg_quality = jpeg_quality
         self._last_capture_time = 0.0
         self._window_region = None
         self._xlib_display = None
         self._pywinctl_window = None
+        # Set while pywinctl's watchdog keeps _window_region up to date
+        self._watching_window = False
+        self._window_region_checked = 0.0
+        # Long-lived `xprop -spy` process signalling changes to the window list
+        self._xprop: Optional[subprocess.Popen] = None
+        self._window_list_changed = threading.Event()
+        self._pipewire: Optional[PipeWireCapture] = None
+        # Resize/convert function for the current source layout (see _build_pipeline)
+        self._pipeline: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        self._pipeline_key: Optional[tuple] = None
+
+        # GPU buffers for the resize/convert step, reused across frames
+        self.use_cuda = False
+        if use_cuda:
+            if hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                self.use_cuda = True
+                self._gpu_src = cv2.cuda_GpuMat()
+                self._gpu_resized = cv2.cuda_GpuMat()
+                self._gpu_bgr = cv2.cuda_GpuMat()
+            else:
+                print("Warning: OpenCV has no usable CUDA device, resizing on the CPU")
+
+        # libjpeg-turbo encoder, if the bindings and shared library are available
+        self._tj = None
+        if HAS_TURBOJPEG:
+            try:
+                self._tj = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                print(f"Warning: libjpeg-turbo unavailable, using OpenCV JPEG encoder: {e}")
 
         # Detect if running on Wayland
         self.is_wayland = os.environ.get("XDG_SESSION_TYPE", "").lower() == "wayland"
 
-        if self.is_wayland and not HAS_PYSCREENSHOT:
-            raise RuntimeError(
-                "Running on Wayland but pyscreenshot is not installed. "
-                "Install with: pip install pyscreenshot"
-            )
-
         # Check window capture support
         if self.mode == "window" and not HAS_PYWINCTL:
             print("Warning: pywinctl not installed. Window capture disabled, using full screen.")
             self.mode = "screen"
 
+        # On Wayland prefer a PipeWire stream over per-frame screenshots
+        if self.is_wayland:
+            try:
+                self._pipewire = PipeWireCapture(self.mode)
+            except Exception as e:
+                print(f"Warning: PipeWire capture unavailable, falling back to pyscreenshot: {e}")
+
+        if self.is_wayland and self._pipewire is None and not HAS_PYSCREENSHOT:
+            raise RuntimeError(
+                "Running on Wayland but pyscreenshot is not installed. "
+                "Install with: pip install pyscreenshot"
+            )
+
         # Use mss only on X11, pyscreenshot on Wayland
         if not self.is_wayland:
             self.sct = mss.mss(with_cursor=False)
+            self._monitor_region = self.sct.monitors[self.monitor_index]
             # Initialize X11 display for window finding (legacy fallback)
             if self.mode == "window" and HAS_XLIB and not HAS_PYWINCTL:
                 try:
@@ -89,11 +352,39 @@ class ScreenCapture:
             print("Detected X11 - using mss backend")
         else:
             self.sct = None
-            if self.mode == "window":
+            if self._pipewire is not None:
+                print("Detected Wayland - using PipeWire ScreenCast backend")
+            elif self.mode == "window":
                 print("Detected Wayland - window capture enabled via GNOME Shell API")
+                self._start_window_spy()
             else:
                 print("Detected Wayland - using pyscreenshot backend")
 
+    def _start_window_spy(self):
+        """
+        Watch the root window's client list and focus with one `xprop -spy` process.
+
+        A reported change triggers a window lookup right away instead of waiting for
+        the WINDOW_REGION_TTL_S refresh.
+        """
+        try:
+            self._xprop = subprocess.Popen(
+                ['xprop', '-spy', '-root', '_NET_CLIENT_LIST_STACKING', '_NET_ACTIVE_WINDOW'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except FileNotFoundError:
+            print("Warning: xprop not found, polling for the window instead")
+            return
+
+        threading.Thread(target=self._read_window_spy, name="xprop-spy", daemon=True).start()
+
+    def _read_window_spy(self):
+        """Flag every property change printed by xprop. Runs on a background thread."""
+        for _ in self._xprop.stdout:
+            self._window_list_changed.set()
+
     def _get_wayland_windows(self) -> list:
         """
         Get list of windows on Wayland via GNOME Shell D-Bus API.
@@ -107,7 +398,7 @@ class ScreenCapture:
                 ['wmctrl', '-lG'],
                 capture_output=True,
                 text=True,
-                timeout=2
+                timeout=WINDOW_QUERY_TIMEOUT_S
             )
 
             if result.returncode == 0:
@@ -134,7 +425,7 @@ class ScreenCapture:
                 ['xdotool', 'search', '--name', self.window_title],
                 capture_output=True,
                 text=True,
-                timeout=2
+                timeout=WINDOW_QUERY_TIMEOUT_S
             )
 
             if result.returncode == 0 and result.stdout.strip():
@@ -145,7 +436,7 @@ class ScreenCapture:
                     ['xdotool', 'getwindowgeometry', '--shell', window_id],
                     capture_output=True,
                     text=True,
-                    timeout=2
+                    timeout=WINDOW_QUERY_TIMEOUT_S
                 )
 
                 if geom_result.returncode == 0:
@@ -264,29 +555,81 @@ class ScreenCapture:
 
         return None
 
+    def _update_window_region(self):
+        """
+        Refresh the cached window region when it may be out of date.
+
+        While pywinctl's watchdog is tracking the window, moves and resizes update the
+        region directly and no lookup is needed. Otherwise the window is looked up again
+        every WINDOW_REGION_TTL_S, or sooner when the xprop spy reports a window list or
+        focus change (the spy does not see moves or resizes, so it never replaces the TTL).
+        """
+        if self._watching_window:
+            return
+
+        now = time.monotonic()
+        if (
+            not self._window_list_changed.is_set()
+            and now - self._window_region_checked < WINDOW_REGION_TTL_S
+        ):
+            return
+        self._window_list_changed.clear()
+        self._window_region_checked = now
+
+        self._window_region = self._find_window_region()
+        if self._window_region:
+            print(f"Found {self.window_title} window at: {self._window_region}")
+            if self._pywinctl_window is not None:
+                self._watch_window(self._pywinctl_window)
+        else:
+            print(f"Warning: {self.window_title} window not found, using full screen")
+
+    def _watch_window(self, window):
+        """Keep _window_region in sync with a pywinctl window as it moves or resizes."""
+
+        def on_geometry_change(_):
+            bbox = window.bbox
+            self._window_region = {
+                'left': bbox.left,
+                'top': bbox.top,
+                'width': bbox.width,
+                'height': bbox.height,
+            }
+
+        def on_alive_change(alive):
+            if not alive:
+                # Window closed; fall back to periodic lookups
+                self._window_region = None
+                self._watching_window = False
+
+        try:
+            window.watchdog.start(
+                isAliveCB=on_alive_change,
+                movedCB=on_geometry_change,
+                resizedCB=on_geometry_change,
+            )
+            self._watching_window = True
+        except Exception as e:
+            print(f"Warning: Could not watch {self.window_title} window for changes: {e}")
+
     def capture_frame(self) -> np.ndarray:
         """
         Capture a frame from the screen.
 
         Returns:
-            numpy array of the captured frame in BGR format
+            numpy array of the captured frame in BGR format. The array is reused by the
+            next capture; copy it to keep it past that.
         """
         start = time.perf_counter()
 
-        if self.is_wayland:
+        if self._pipewire is not None:
+            # The window (if any) was already chosen in the portal's source picker
+            frame = self._pipewire.read()
+            conversion = None
+        elif self.is_wayland:
             # Use pyscreenshot for Wayland
             if self.mode == "window":
-                # Update window region periodically (every 30 frames or if not found)
-                if self._window_region is None or (hasattr(self, '_frame_count') and self._frame_count % 30 == 0):
-                    self._window_region = self._find_window_region()
-                    if self._window_region:
-                        print(f"Found {self.window_title} window at: {self._window_region}")
-                    else:
-                        print(f"Warning: {self.window_title} window not found, using full screen")
-
-                if not hasattr(self, '_frame_count'):
-                    self._frame_count = 0
-                self._frame_count += 1
+                self._update_window_region()
 
                 # Capture window region if found, otherwise full screen
                 if self._window_region:
@@ -304,69 +647,194 @@ class ScreenCapture:
                 pil_image = ImageGrab.grab()
 
             # Convert PIL Image to numpy array (RGB)
-            frame = np.array(pil_image)
-            # Convert RGB to BGR
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            frame = np.asarray(pil_image)
+            conversion = cv2.COLOR_RGB2BGR
         else:
             # Use mss for X11
             if self.mode == "window":
-                # Update window region periodically (every 30 frames or if not found)
-                if self._window_region is None or (hasattr(self, '_frame_count') and self._frame_count % 30 == 0):
-                    self._window_region = self._find_window_region()
-                    if self._window_region:
-                        print(f"Found {self.window_title} window at: {self._window_region}")
-                    else:
-                        print(f"Warning: {self.window_title} window not found, using full screen")
-
-                if not hasattr(self, '_frame_count'):
-                    self._frame_count = 0
-                self._frame_count += 1
+                self._update_window_region()
 
                 # Use window region if found, otherwise fall back to monitor
-                capture_region = self._window_region if self._window_region else self.sct.monitors[self.monitor_index]
+                capture_region = self._window_region if self._window_region else self._monitor_region
                 screenshot = self.sct.grab(capture_region)
             else:
-                monitor = self.sct.monitors[self.monitor_index]
-                screenshot = self.sct.grab(monitor)
+                screenshot = self.sct.grab(self._monitor_region)
 
-            # Convert to numpy array
-            frame = np.array(screenshot)
-            # Convert BGRA to BGR
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            # Zero-copy BGRA view over mss's own buffer
+            frame = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+                screenshot.height, screenshot.width, 4
+            )
+            conversion = cv2.COLOR_BGRA2BGR
 
-        # Resize to target resolution
-        if frame.shape[:2][::-1] != self.target_resolution:
-            frame = cv2.resize(frame, self.target_resolution, interpolation=cv2.INTER_AREA)
+        # The resize/convert steps only depend on the source layout, which rarely
+        # changes, so they are chosen once and replayed for every frame
+        pipeline_key = (frame.shape, conversion)
+        if pipeline_key != self._pipeline_key:
+            self._pipeline = self._build_pipeline(frame.shape, conversion)
+            self._pipeline_key = pipeline_key
+        frame = self._pipeline(frame)
 
         self._last_capture_time = time.perf_counter() - start
         return frame
 
+    def _build_pipeline(
+        self, src_shape: tuple[int, ...], conversion: Optional[int]
+    ) -> Callable[[np.ndarray], np.ndarray]:
+        """
+        Build the resize/convert function for one source frame layout.
+
+        The resize strategy, pyrDown depth and output buffers are fixed here, so the
+        per-frame function runs a straight sequence of OpenCV calls.
+
+        Args:
+            src_shape: Shape of the raw captured frame (height, width, channels)
+            conversion: cv2 color conversion code to BGR, or None if already BGR
+
+        Returns:
+            Function mapping a raw frame to the BGR frame at target resolution
+        """
+        src_height, src_width, channels = src_shape
+        width, height = self.target_resolution
+        # Reused output buffer; callers must copy frames they keep (see capture_frame)
+        out = np.empty((height, width, 3), dtype=np.uint8)
+
+        if self.use_cuda:
+            return lambda frame: self._resize_and_convert_gpu(frame, conversion, out)
+
+        # Resize first so the color conversion only touches target-size pixels
+        if (src_width, src_height) == (width, height):
+            resize = None
+        elif src_width % width == 0 and src_height % height == 0:
+            # Integer ratio: take every Nth pixel through a strided view, no kernel
+            step_y, step_x = src_height // height, src_width // width
+
+            def resize(frame):
+                return frame[::step_y, ::step_x]
+
+            if conversion is None:
+
+                def stride_copy(frame):
+                    np.copyto(out, resize(frame))
+                    return out
+
+                return stride_copy
+        else:
+            # Halve with SIMD pyrDown until within 2x of the target, so the final
+            # linear resize never skips source pixels
+            pyr_levels = 0
+            while src_width >= 2 * width and src_height >= 2 * height:
+                src_width, src_height = (src_width + 1) // 2, (src_height + 1) // 2
+                pyr_levels += 1
+            resized = out if conversion is None else np.empty((height, width, channels), np.uint8)
+
+            def resize(frame):
+                for _ in range(pyr_levels):
+                    frame = cv2.pyrDown(frame)
+                return cv2.resize(
+                    frame, (width, height), dst=resized, interpolation=cv2.INTER_LINEAR
+                )
+
+            if conversion is None:
+                return resize
+
+        # Convert to BGR
+        if conversion is None:
+            return lambda frame: frame
+        if resize is None:
+            return lambda frame: cv2.cvtColor(frame, conversion, dst=out)
+        return lambda frame: cv2.cvtColor(resize(frame), conversion, dst=out)
+
+    def _resize_and_convert_gpu(
+        self, frame: np.ndarray, conversion: Optional[int], out: np.ndarray
+    ) -> np.ndarray:
+        """
+        Resize and color-convert a frame on the GPU.
+
+        Only the full-size frame is uploaded and only the small BGR result is
+        downloaded, into `out`.
+        """
+        self._gpu_src.upload(frame)
+        gpu_frame = self._gpu_src
+        if frame.shape[:2][::-1] != self.target_resolution:
+            gpu_frame = cv2.cuda.resize(
+                gpu_frame, self.target_resolution, dst=self._gpu_resized,
+                interpolation=cv2.INTER_AREA,
+            )
+        if conversion is not None:
+            gpu_frame = cv2.cuda.cvtColor(gpu_frame, conversion, dst=self._gpu_bgr)
+        return gpu_frame.download(out)
+
+    def frame_to_jpeg_bytes(self, frame: np.ndarray) -> bytes | memoryview:
+        """
+        Encode a frame as JPEG.
+
+        Uses libjpeg-turbo when available, otherwise OpenCV. Both encode BGR natively,
+        so no color conversion or PIL round-trip is needed.
+
+        Args:
+            frame: BGR numpy array
+
+        Returns:
+            JPEG data as a bytes-like object (OpenCV's output buffer is not copied)
+        """
+        if self._tj is not None:
+            return self._tj.encode(
+                frame,
+                quality=int(self.jpeg_quality * 100),
+                pixel_format=TJPF_BGR,
+                jpeg_subsample=TJSAMP_420,
+            )
+
+        ok, buf = cv2.imencode(
+            ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(self.jpeg_quality * 100)]
+        )
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        return buf.reshape(-1).data
+
+    def frame_to_jpeg_base64(self, frame: np.ndarray) -> str:
+        """
+        Convert a frame to JPEG format and encode as base64 data URL.
+
+        Args:
+            frame: BGR numpy array
+
+        Returns:
+            Base64-encoded JPEG data URL
+        """
+        return jpeg_to_data_url(self.frame_to_jpeg_bytes(frame))
+
     def frame_to_png_base64(self, frame: np.ndarray) -> str:
         """
         Convert a frame to PNG format and encode as base64 data URL.
 
+        Deprecated: lossless but much slower and larger than frame_to_jpeg_base64.
+        Kept only for callers that need exact pixels through the OpenAI-style API.
+
         Args:
             frame: BGR numpy array
 
         Returns:
             Base64-encoded PNG data URL
         """
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Convert to PIL Image
-        pil_image = Image.fromarray(rgb_frame)
-
-        # Encode as PNG to bytes
+        warnings.warn(
+            "frame_to_png_base64 is deprecated; use frame_to_jpeg_base64",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        # Let PIL read the BGR bytes directly instead of converting to RGB first
+        height, width = frame.shape[:2]
+        pil_image = Image.frombuffer(
+            "RGB", (width, height), np.ascontiguousarray(frame), "raw", "BGR", 0, 1
+        )
+
+        # Encode as PNG to bytes (fastest zlib level; size matters less than latency)
         buffer = BytesIO()
-        pil_image.save(buffer, format="PNG", optimize=True)
+        pil_image.save(buffer, format="PNG", optimize=False, compress_level=1)
         png_bytes = buffer.getvalue()
 
-        # Encode to base64
-        b64_data = base64.b64encode(png_bytes).decode("utf-8")
-
-        # Return as data URL
-        return f"data:image/png;base64,{b64_data}"
+        # Encode to base64 and return as data URL (output is pure ASCII)
+        return (PNG_DATA_URL_PREFIX + b64encode(png_bytes)).decode("ascii")
 
     def get_last_capture_time_ms(self) -> float:
         """Get the time taken for the last capture in milliseconds."""
@@ -374,8 +842,17 @@ class ScreenCapture:
 
     def close(self):
         """Release resources."""
+        if self._watching_window:
+            self._pywinctl_window.watchdog.stop()
+            self._watching_window = False
+        if self._xprop is not None:
+            self._xprop.terminate()
+            self._xprop.wait()
+            self._xprop = None
         if self.sct is not None:
             self.sct.close()
+        if self._pipewire is not None:
+            self._pipewire.close()
         if self._xlib_display is not None:
             self._xlib_display.close()
 
@@ -386,3 +863,114 @@ class ScreenCapture:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit."""
         self.close()
+
+
+class CaptureWorker:
+    """
+    Runs screen capture and JPEG encoding off the caller's thread.
+
+    A capture thread grabs frames at the target FPS and hands each one to a small
+    encoder pool. Encoding releases the GIL, so it overlaps with the next grab.
+    Frames identical to the previous capture are not encoded or published until
+    the screen has been static for `max_static_s`, so consumers keyed on the
+    sequence number still get a fresh frame now and then. Only the newest encoded
+    frame is kept.
+    """
+
+    def __init__(
+        self,
+        capture: ScreenCapture,
+        fps: int,
+        encode_workers: int = 2,
+        max_static_s: float = 1.0,
+    ):
+        """
+        Initialize the capture worker.
+
+        Args:
+            capture: Screen capture to pull frames from (owned by the caller)
+            fps: Target capture rate
+            encode_workers: Number of threads encoding frames concurrently
+            max_static_s: Republish an unchanged frame once the last published one
+                is this old (0 publishes every frame)
+        """
+        self.capture = capture
+        self.interval = 1.0 / fps
+        self.max_static_ns = int(max_static_s * 1e9)
+        self.errors = 0
+        self.duplicates = 0
+        # Set whenever a newer encoded frame becomes available
+        self.frame_ready = threading.Event()
+        self._encoder = ThreadPoolExecutor(
+            max_workers=encode_workers, thread_name_prefix="frame-encode"
+        )
+        self._lock = threading.Lock()
+        self._latest: Optional[tuple[int, bytes | memoryview, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start capturing in a background thread."""
+        self._thread = threading.Thread(target=self._run, name="frame-capture", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Capture loop. Runs on the capture thread."""
+        seq = 0
+        last_digest = None
+        last_published = 0
+        while not self._stop.is_set():
+            start = time.perf_counter_ns()
+            try:
+                frame = self.capture.capture_frame()
+            except Exception as e:
+                self.errors += 1
+                print(f"Warning: Frame capture failed: {e}")
+            else:
+                digest = frame_digest(np.ascontiguousarray(frame))
+                if digest == last_digest and start - last_published < self.max_static_ns:
+                    # Nothing changed on screen (paused, menus, ...): skip the encode
+                    self.duplicates += 1
+                else:
+                    last_digest = digest
+                    last_published = start
+                    seq += 1
+                    # capture_frame() reuses its output buffer, so the encoder gets a copy
+                    self._encoder.submit(self._encode, seq, frame.copy(), start)
+
+            self._stop.wait(max(0.0, self.interval - (time.perf_counter_ns() - start) * 1e-9))
+
+    def _encode(self, seq: int, frame: np.ndarray, start: int):
+        """Encode one frame and publish it. Runs on the encoder pool."""
+        try:
+            jpeg_bytes = self.capture.frame_to_jpeg_bytes(frame)
+        except Exception as e:
+            self.errors += 1
+            print(f"Warning: Frame encoding failed: {e}")
+            return
+
+        elapsed_ns = time.perf_counter_ns() - start
+        with self._lock:
+            # Encodes can finish out of order; never replace a newer frame
+            if self._latest is None or seq > self._latest[0]:
+                self._latest = (seq, jpeg_bytes, elapsed_ns)
+                self.frame_ready.set()
+
+    def latest_frame(self) -> Optional[tuple[int, bytes | memoryview, int]]:
+        """
+        Get the newest encoded frame without blocking.
+
+        Returns:
+            (sequence, JPEG bytes, capture + encode time in ns), or None before the
+            first frame is ready
+        """
+        with self._lock:
+            return self._latest
+
+    def stop(self):
+        """Stop capturing and wait for in-flight encodes to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._encoder.shutdown(wait=True)
@@ -1,6 +1,10 @@
 """Command-line interface for the Minecraft AI agent."""
 
 import asyncio
+import logging
+import os
+from enum import Enum
+from typing import Optional
 
 import typer
 from rich.console import Console
@@ -13,6 +17,33 @@ app = typer.Typer(help="Minecraft AI Agent - Control Minecraft using Qwen2.5-VL"
 console = Console()
 
 
+class Precision(str, Enum):
+    """Precisions a VLM server can report for benchmark results."""
+
+    bf16 = "bf16"
+    fp16 = "fp16"
+    fp8 = "fp8"
+
+
+@app.callback()
+def main():
+    """Minecraft AI Agent - Control Minecraft using Qwen2.5-VL."""
+    # Diagnostic output (e.g. per-frame bridge logs) is opt-in via LOG_LEVEL=DEBUG
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def _run_async(coro):
+    """Run a coroutine on uvloop when it is installed, otherwise on the default loop."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
+    return uvloop.run(coro)
+
+
 @app.command()
 def run(
     goal: str = typer.Option(
@@ -36,7 +67,7 @@ def run(
     loop = AgentLoop(config, goal)
 
     try:
-        asyncio.run(loop.run())
+        _run_async(loop.run())
     except KeyboardInterrupt:
         console.print("\n[yellow]Agent stopped by user[/yellow]")
 
@@ -49,6 +80,17 @@ def benchmark(
         "-d",
         help="Duration of the benchmark in seconds",
     ),
+    max_new_tokens: Optional[int] = typer.Option(
+        None,
+        "--max-new-tokens",
+        help="Override MAX_NEW_TOKENS for this run (decode time scales with it)",
+    ),
+    precision: Optional[Precision] = typer.Option(
+        None,
+        "--precision",
+        case_sensitive=False,
+        help="Precision the VLM server runs at; recorded with the results",
+    ),
 ):
     """
     Run performance benchmarks.
@@ -57,6 +99,10 @@ def benchmark(
     Results are saved to agent/logs/bench.jsonl.
     """
     config = Config.from_env()
+    if max_new_tokens is not None:
+        config.max_new_tokens = max_new_tokens
+    if precision is not None:
+        config.vlm_precision = precision.value  # type: ignore
 
     console.print("[bold cyan]Minecraft AI Agent - Benchmark Mode[/bold cyan]")
     console.print("=" * 50)
@@ -64,7 +110,7 @@ def benchmark(
     runner = BenchmarkRunner(config, duration)
 
     try:
-        asyncio.run(runner.run())
+        _run_async(runner.run())
     except KeyboardInterrupt:
         console.print("\n[yellow]Benchmark stopped by user[/yellow]")
 
@@ -138,7 +184,7 @@ async def _test_mod_capture(config: Config, duration: int, save_screenshots: boo
     frame_count = 0
     start_time = time.time()
 
-    def on_frame(frame_data: bytes, seq: int, ts: int):
+    def on_frame(frame_data: memoryview, seq: int, ts: int):
         nonlocal frame_count
         frame_count += 1
 
@@ -149,11 +195,12 @@ async def _test_mod_capture(config: Config, duration: int, save_screenshots: boo
                 f.write(frame_data)
 
         if frame_count % config.capture_fps == 0:
+            # Measure arrivals, not just the frames left after latest-wins coalescing
             elapsed = time.time() - start_time
-            actual_fps = frame_count / elapsed
+            actual_fps = bridge.frames_received / elapsed
             console.print(
-                f"Received {frame_count} frames in {elapsed:.1f}s "
-                f"(avg {actual_fps:.1f} FPS, seq={seq})"
+                f"Received {bridge.frames_received} frames in {elapsed:.1f}s "
+                f"(avg {actual_fps:.1f} FPS, {bridge.frames_dropped} dropped, seq={seq})"
             )
 
     async with BridgeClient(config.bridge_ws_url) as bridge:
@@ -188,10 +235,12 @@ async def _test_mod_capture(config: Config, duration: int, save_screenshots: boo
             return
 
     total_time = time.time() - start_time
-    avg_fps = frame_count / total_time if total_time > 0 else 0
+    avg_fps = bridge.frames_received / total_time if total_time > 0 else 0
 
     console.print(f"\n[green]Test complete![/green]")
-    console.print(f"Total frames: {frame_count}")
+    console.print(f"Frames received: {bridge.frames_received}")
+    console.print(f"Frames dropped (superseded before handling): {bridge.frames_dropped}")
+    console.print(f"Frames handled: {frame_count}")
     console.print(f"Average FPS: {avg_fps:.2f}")
     if save_screenshots and screenshots_dir:
         console.print(f"Screenshots saved to: {screenshots_dir}")
@@ -201,7 +250,6 @@ def _test_screen_capture(config: Config, duration: int, save_screenshots: bool):
     """Test screen/window capture."""
     from .capture import ScreenCapture
     import time
-    import cv2
     from pathlib import Path
 
     # Create screenshots directory if saving
@@ -215,6 +263,8 @@ def _test_screen_capture(config: Config, duration: int, save_screenshots: bool):
         mode=config.capture_mode,
         target_resolution=config.capture_resolution,
         window_title=config.capture_window_title,
+        jpeg_quality=config.jpeg_quality,
+        use_cuda=config.capture_cuda,
     ) as capture:
         frame_count = 0
         start_time = time.time()
@@ -226,10 +276,10 @@ def _test_screen_capture(config: Config, duration: int, save_screenshots: bool):
             frame = capture.capture_frame()
             frame_count += 1
 
-            # Save screenshot if enabled
+            # Save screenshot if enabled (the same JPEG the VLM would receive)
             if save_screenshots and screenshots_dir:
-                screenshot_path = screenshots_dir / f"frame_{frame_count:05d}.png"
-                cv2.imwrite(str(screenshot_path), frame)
+                screenshot_path = screenshots_dir / f"frame_{frame_count:05d}.jpg"
+                screenshot_path.write_bytes(capture.frame_to_jpeg_bytes(frame))
 
             if frame_count % config.capture_fps == 0:
                 elapsed = time.time() - start_time
@@ -2,7 +2,7 @@
 
 import os
 from dataclasses import dataclass
-from typing import Literal
+from typing import ClassVar, Literal
 
 
 @dataclass
@@ -11,10 +11,15 @@ class Config:
 
     LLM_BASE_URL: str
     LLM_MODEL: str
+    vlm_precision: Literal["bf16", "fp16", "fp8"]
+    vlm_reuse_ttl_ms: int
+    vlm_stream: bool
     bridge_ws_url: str
+    bridge_coalesce_ms: int
     capture_mode: Literal["screen", "window", "mod"]
     capture_window_title: str
     capture_fps: int
+    capture_cuda: bool
     decision_hz: int
     max_new_tokens: int
     output_strict_json: bool
@@ -23,32 +28,54 @@ class Config:
     max_actions_per_minute: int
     capture_resolution: tuple[int, int]
     jpeg_quality: float
+    debug_frames: bool
+
+    # Alternative environment variable names accepted for a setting, mapped to the
+    # canonical name. The canonical name wins if both are set.
+    ALIASES: ClassVar[dict[str, str]] = {
+        "VLLM_BASE_URL": "LLM_BASE_URL",
+        "VLLM_MODEL": "LLM_MODEL",
+    }
 
     @classmethod
     def from_env(cls) -> "Config":
         """Load configuration from environment variables."""
+        env = {
+            canonical: os.environ[alias]
+            for alias, canonical in cls.ALIASES.items()
+            if alias in os.environ
+        }
+        env.update(os.environ)
+        getenv = env.get
+
         return cls(
-            LLM_BASE_URL=os.getenv("LLM_BASE_URL", "http://127.0.0.1:7000/v1"),
-            LLM_MODEL=os.getenv("LLM_MODEL", "Qwen/Qwen2-VL-2B-Instruct"),
-            bridge_ws_url=os.getenv("BRIDGE_WS_URL", "ws://127.0.0.1:8765/ws"),
-            capture_mode=os.getenv("CAPTURE_MODE", "mod"),  # type: ignore
-            capture_window_title=os.getenv("CAPTURE_WINDOW_TITLE", "Minecraft"),
-            capture_fps=int(os.getenv("CAPTURE_FPS", "10")),
-            decision_hz=int(os.getenv("DECISION_HZ", "6")),
-            max_new_tokens=int(os.getenv("MAX_NEW_TOKENS", "128")),
-            output_strict_json=bool(int(os.getenv("OUTPUT_STRICT_JSON", "1"))),
-            action_duration_ms_default=int(os.getenv("ACTION_DURATION_MS_DEFAULT", "150")),
-            kill_switch_key=os.getenv("KILL_SWITCH_KEY", "F10"),
-            max_actions_per_minute=int(os.getenv("MAX_ACTIONS_PER_MINUTE", "1200")),
+            LLM_BASE_URL=getenv("LLM_BASE_URL", "http://127.0.0.1:7000/v1"),
+            LLM_MODEL=getenv("LLM_MODEL", "Qwen/Qwen2-VL-2B-Instruct"),
+            vlm_precision=getenv("VLM_PRECISION", "bf16"),  # type: ignore
+            vlm_reuse_ttl_ms=int(getenv("VLM_REUSE_TTL_MS", "1000")),
+            vlm_stream=bool(int(getenv("VLM_STREAM", "0"))),
+            bridge_ws_url=getenv("BRIDGE_WS_URL", "ws://127.0.0.1:8765/ws"),
+            bridge_coalesce_ms=int(getenv("BRIDGE_COALESCE_MS", "0")),
+            capture_mode=getenv("CAPTURE_MODE", "mod"),  # type: ignore
+            capture_window_title=getenv("CAPTURE_WINDOW_TITLE", "Minecraft"),
+            capture_fps=int(getenv("CAPTURE_FPS", "10")),
+            capture_cuda=bool(int(getenv("CAPTURE_CUDA", "0"))),
+            decision_hz=int(getenv("DECISION_HZ", "6")),
+            max_new_tokens=int(getenv("MAX_NEW_TOKENS", "128")),
+            output_strict_json=bool(int(getenv("OUTPUT_STRICT_JSON", "1"))),
+            action_duration_ms_default=int(getenv("ACTION_DURATION_MS_DEFAULT", "150")),
+            kill_switch_key=getenv("KILL_SWITCH_KEY", "F10"),
+            max_actions_per_minute=int(getenv("MAX_ACTIONS_PER_MINUTE", "1200")),
             capture_resolution=(384, 216),  # 216p - optimized for VLM speed
-            jpeg_quality=float(os.getenv("JPEG_QUALITY", "0.5")),
+            jpeg_quality=float(getenv("JPEG_QUALITY", "0.5")),
+            debug_frames=bool(int(getenv("DEBUG_FRAMES", "0"))),
         )
 
     def __str__(self) -> str:
         """Return a formatted string representation of the config."""
         return (
             f"Config:\n"
-            f"  VLM: {self.LLM_BASE_URL} ({self.LLM_MODEL})\n"
+            f"  VLM: {self.LLM_BASE_URL} ({self.LLM_MODEL}, {self.vlm_precision})\n"
             f"  Bridge: {self.bridge_ws_url}\n"
             f"  Capture: {self.capture_mode} @ {self.capture_fps} fps "
             f"({self.capture_resolution[0]}x{self.capture_resolution[1]})\n"
@@ -1,7 +1,6 @@
 """Main agent control loop."""
 
 import asyncio
-import base64
 import time
 from typing import Optional
 
@@ -10,11 +9,14 @@ from rich.live import Live
 from rich.table import Table
 
 from .bridge_client import BridgeClient
-from .capture import ScreenCapture
+from .capture import CaptureWorker, ScreenCapture
 from .config import Config
 from .policy import VLMPolicy
 from .protocol import AckMessage, StateMessage
 
+# Weight of the newest sample in the running timing averages
+STATS_EMA_ALPHA = 0.1
+
 
 class AgentLoop:
     """Main control loop for the Minecraft AI agent."""
@@ -29,20 +31,37 @@ class AgentLoop:
         # Components
         if self.use_mod_frames:
             self.capture = None
+            self.capture_worker = None
         else:
             self.capture = ScreenCapture(
                 mode=config.capture_mode,
                 target_resolution=config.capture_resolution,
                 window_title=config.capture_window_title,
+                jpeg_quality=config.jpeg_quality,
+                use_cuda=config.capture_cuda,
+            )
+            # Capture and encode continuously on worker threads
+            self.capture_worker = CaptureWorker(
+                self.capture,
+                config.capture_fps,
+                # A static screen (wall, menu, death screen) still gets decided on
+                max_static_s=config.vlm_reuse_ttl_ms / 1000,
             )
         self.policy = VLMPolicy(config)
-        self.bridge = BridgeClient(config.bridge_ws_url)
+        self.bridge = BridgeClient(config.bridge_ws_url, coalesce_ms=config.bridge_coalesce_ms)
 
         # State
         self.running = False
         self.latest_state: Optional[StateMessage] = None
         self.latest_ack: Optional[AckMessage] = None
-        self.latest_frame: Optional[bytes] = None
+        self.latest_frame: Optional[memoryview] = None
+        self.latest_frame_seq = -1
+        # Sequence number of the last frame handed to inference (mod or capture worker)
+        self._last_capture_seq = -1
+        # Set when the mod pushes a frame the capture stage has not picked up yet
+        self._frame_event = asyncio.Event()
+        self._start_ns = 0
+        self._send_writes = 0
         self.stats = {
             "iterations": 0,
             "actions_sent": 0,
@@ -52,9 +71,11 @@ class AgentLoop:
             "actions_succeeded": 0,
             "errors": 0,
             "frames_received": 0,
-            "total_capture_ms": 0.0,
-            "total_inference_ms": 0.0,
-            "total_send_ms": 0.0,
+            # Exponential moving averages of per-iteration stage timings (ns;
+            # converted to ms only for display)
+            "avg_capture_ns": 0.0,
+            "avg_inference_ns": 0.0,
+            "avg_send_ns": 0.0,
         }
 
     async def run(self):
@@ -64,6 +85,7 @@ class AgentLoop:
         # Set up callbacks
         self.bridge.set_state_callback(self._on_state)
         self.bridge.set_ack_callback(self._on_ack)
+        self.bridge.set_sent_callback(self._on_sent)
         if self.use_mod_frames:
             self.bridge.set_frame_callback(self._on_frame)
 
@@ -95,106 +117,172 @@ class AgentLoop:
 
         # Start receiving messages in background
         receive_task = asyncio.create_task(self.bridge.receive_messages())
+        if self.capture_worker:
+            self.capture_worker.start()
 
         # Display configuration
         self.console.print("\n" + str(self.config))
         self.console.print(f"\n[yellow]Goal: {self.goal}[/yellow]")
         self.console.print(f"[yellow]Kill switch: Press {self.config.kill_switch_key} to stop[/yellow]\n")
 
-        # Calculate loop interval
-        loop_interval = 1.0 / self.config.decision_hz
+        # Capture, inference and send run as separate stages joined by size-1
+        # queues, so a frame is picked up while the previous one is still being
+        # inferred and its action sent. Each queue keeps only the newest item.
+        frame_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        action_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        stage_tasks = [
+            asyncio.create_task(self._capture_loop(frame_queue)),
+            asyncio.create_task(self._inference_loop(frame_queue, action_queue)),
+            asyncio.create_task(self._send_loop(action_queue)),
+        ]
+        self._start_ns = time.perf_counter_ns()
 
         # Run the main loop with live stats display
-        with Live(self._generate_stats_table(), console=self.console, refresh_per_second=4) as live:
+        with Live(self._generate_stats_table(), console=self.console, refresh_per_second=2) as live:
             try:
                 while self.running:
-                    iteration_start = time.perf_counter()
-
-                    # Execute one iteration
-                    await self._run_iteration()
-
-                    # Update display
                     live.update(self._generate_stats_table())
-
-                    # Maintain target Hz
-                    elapsed = time.perf_counter() - iteration_start
-                    sleep_time = max(0, loop_interval - elapsed)
-                    if sleep_time > 0:
-                        await asyncio.sleep(sleep_time)
+                    await asyncio.sleep(0.5)
 
             except KeyboardInterrupt:
                 self.console.print("\n[yellow]Received interrupt signal[/yellow]")
             finally:
                 self.running = False
+                for task in stage_tasks:
+                    task.cancel()
                 receive_task.cancel()
                 await self.bridge.close()
+                if self.capture_worker:
+                    self.capture_worker.stop()
                 if self.capture:
                     self.capture.close()
-                self.policy.close()
+                await self.policy.close()
 
         # Print final stats
         self._print_final_stats()
 
-    async def _run_iteration(self):
-        """Execute one iteration of the agent loop."""
-        try:
-            self.stats["iterations"] += 1
-
-            # 1. Get frame (from mod or screen capture)
-            if self.use_mod_frames:
-                # Use frame from mod via WebSocket
-                if self.latest_frame is None:
-                    # No frame yet, skip this iteration
-                    return
-
-                # Convert JPEG bytes to base64 data URL
-                capture_start = time.perf_counter()
-                b64_data = base64.b64encode(self.latest_frame).decode("utf-8")
-                image_data_url = f"data:image/jpeg;base64,{b64_data}"
-                self.stats["total_capture_ms"] += (time.perf_counter() - capture_start) * 1000
-            else:
-                # Use screen capture
-                frame = self.capture.capture_frame()
-                self.stats["total_capture_ms"] += self.capture.get_last_capture_time_ms()
-                image_data_url = self.capture.frame_to_png_base64(frame)
-
-            # 2. Get state dict for context
-            state_dict = None
-            if self.latest_state:
-                player = self.latest_state.player
-                state_dict = {
-                    "pos": (player.x, player.y, player.z),
-                    "health": player.health,
-                    "hunger": player.food,
-                }
-
-            # 3. Get action from policy
-            # IMPORTANT: VLM inference uses a synchronous HTTP client. If we run it on the
-            # asyncio event loop thread, it blocks frame reception (binary websocket
-            # messages) and can cause the mod to disconnect us. Offload to a worker thread.
-            action = await asyncio.to_thread(
-                self.policy.get_action, image_data_url, self.goal, state_dict
-            )
-            self.stats["total_inference_ms"] += self.policy.get_last_inference_time_ms()
+    @staticmethod
+    def _put_latest(queue: asyncio.Queue, item):
+        """Put an item on a size-1 queue, replacing one that is still waiting."""
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def _capture_loop(self, frame_queue: asyncio.Queue):
+        """Stage 1: hand the newest frame and state to inference at decision_hz."""
+        loop_interval_ns = 1_000_000_000 // self.config.decision_hz
+        while self.running:
+            iteration_start = time.perf_counter_ns()
+            try:
+                item = self._next_frame()
+                if item is not None:
+                    self._put_latest(frame_queue, item)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.console.print(f"[red]Error in capture: {e}[/red]")
 
-            # 4. Send action to bridge
-            sent = await self.bridge.send_action(action)
-            if sent:
-                self.stats["actions_sent"] += 1
-                self.stats["total_send_ms"] += self.bridge.get_last_send_time_ms()
+            # Maintain target Hz
+            elapsed_ns = time.perf_counter_ns() - iteration_start
+            await asyncio.sleep(max(0, loop_interval_ns - elapsed_ns) * 1e-9)
 
-        except Exception as e:
-            self.stats["errors"] += 1
-            self.console.print(f"[red]Error in iteration: {e}[/red]")
+            if self.use_mod_frames:
+                # Sleep until the mod sends a new frame instead of waking on a timer
+                # to find nothing; the timeout just bounds the wait.
+                try:
+                    await asyncio.wait_for(self._frame_event.wait(), loop_interval_ns * 1e-9)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _next_frame(self) -> Optional[tuple[bytes | memoryview, Optional[dict], int]]:
+        """
+        Get the newest frame to decide on.
+
+        Returns:
+            (JPEG bytes, state dict, capture time in ns), or None if there is no new frame
+        """
+        capture_ns = 0
+        if self.use_mod_frames:
+            # Use frame from mod via WebSocket
+            self._frame_event.clear()
+            if self.latest_frame is None:
+                # No frame yet, skip this iteration
+                return None
+            if self.latest_frame_seq == self._last_capture_seq:
+                # Already decided on this frame; wait for a newer one
+                return None
+            self._last_capture_seq = self.latest_frame_seq
+
+            # Already JPEG; handed to the policy as-is
+            jpeg_bytes = self.latest_frame
+        else:
+            # Use the newest frame from the capture worker
+            latest = self.capture_worker.latest_frame()
+            if latest is None:
+                # No frame encoded yet, skip this iteration
+                return None
+            seq, jpeg_bytes, capture_ns = latest
+            if seq == self._last_capture_seq:
+                # Screen unchanged (and not yet stale) since the last decision; skip inference
+                return None
+            self._last_capture_seq = seq
+
+        # State dict for context
+        state_dict = None
+        if self.latest_state:
+            player = self.latest_state.player
+            state_dict = {
+                "pos": (player.x, player.y, player.z),
+                "health": player.health,
+                "hunger": player.food,
+            }
+
+        return jpeg_bytes, state_dict, capture_ns
+
+    async def _inference_loop(self, frame_queue: asyncio.Queue, action_queue: asyncio.Queue):
+        """Stage 2: run each queued frame through the policy."""
+        while self.running:
+            jpeg_bytes, state_dict, capture_ns = await frame_queue.get()
+            try:
+                action = await self.policy.get_action(jpeg_bytes, self.goal, state_dict)
+                self.stats["iterations"] += 1
+                self._update_avg("avg_capture_ns", capture_ns, self.stats["iterations"])
+                self._update_avg(
+                    "avg_inference_ns",
+                    self.policy.get_last_inference_time_ns(),
+                    self.stats["iterations"],
+                )
+                self._put_latest(action_queue, action)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.console.print(f"[red]Error in inference: {e}[/red]")
+
+    async def _send_loop(self, action_queue: asyncio.Queue):
+        """Stage 3: queue each action on the bridge without waiting for the write."""
+        while self.running:
+            action = await action_queue.get()
+            try:
+                # Counted and timed in _on_sent() once the bridge has written it
+                self.bridge.send_action_nowait(action)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.console.print(f"[red]Error sending action: {e}[/red]")
 
     def _on_state(self, state: StateMessage):
         """Callback for state updates."""
         self.latest_state = state
 
-    def _on_frame(self, frame_data: bytes, seq: int, ts: int):
+    def _on_frame(self, frame_data: memoryview, seq: int, ts: int):
         """Callback for frame updates from mod."""
         self.latest_frame = frame_data
+        self.latest_frame_seq = seq
         self.stats["frames_received"] += 1
+        self._frame_event.set()
+
+    def _on_sent(self, count: int, send_ns: int):
+        """Callback for each frame of actions written to the bridge."""
+        self.stats["actions_sent"] += count
+        self._send_writes += 1
+        self._update_avg("avg_send_ns", send_ns, self._send_writes)
 
     def _on_ack(self, ack: AckMessage):
         """Callback for action acknowledgments."""
@@ -203,41 +291,60 @@ class AgentLoop:
         if ack.success:
             self.stats["actions_succeeded"] += 1
 
-    def _generate_stats_table(self) -> Table:
-        """Generate a stats table for display."""
-        table = Table(title="Agent Statistics", show_header=True)
-        table.add_column("Metric", style="cyan")
-        table.add_column("Value", style="green")
+    def _update_avg(self, key: str, sample_ns: int, count: int):
+        """Fold a timing sample into its moving average (seeded by the first sample)."""
+        if count == 1:
+            self.stats[key] = sample_ns
+        else:
+            self.stats[key] += STATS_EMA_ALPHA * (sample_ns - self.stats[key])
 
-        # Calculate averages
-        iters = max(self.stats["iterations"], 1)
-        avg_capture = self.stats["total_capture_ms"] / iters
-        avg_inference = self.stats["total_inference_ms"] / iters
-        avg_send = self.stats["total_send_ms"] / iters
+    def _stats_rows(self) -> list[tuple[str, str]]:
+        """Metric/value pairs shown in the stats table."""
+        avg_capture = self.stats["avg_capture_ns"] / 1e6
+        avg_inference = self.stats["avg_inference_ns"] / 1e6
+        avg_send = self.stats["avg_send_ns"] / 1e6
         avg_total = avg_capture + avg_inference + avg_send
 
-        table.add_row("Iterations", str(self.stats["iterations"]))
-        table.add_row("Actions Sent", str(self.stats["actions_sent"]))
-        table.add_row("Acks Received", str(self.stats["actions_acked"]))
-        table.add_row("Actions Succeeded", str(self.stats["actions_succeeded"]))
+        rows = [
+            ("Iterations", str(self.stats["iterations"])),
+            ("Actions Sent", str(self.stats["actions_sent"])),
+            ("Acks Received", str(self.stats["actions_acked"])),
+            ("Actions Succeeded", str(self.stats["actions_succeeded"])),
+        ]
         if self.use_mod_frames:
-            table.add_row("Frames Received", str(self.stats["frames_received"]))
-        table.add_row("Errors", str(self.stats["errors"]))
-        table.add_row("---", "---")
-        table.add_row("Avg Capture (ms)", f"{avg_capture:.1f}")
-        table.add_row("Avg Inference (ms)", f"{avg_inference:.1f}")
-        table.add_row("Avg Send (ms)", f"{avg_send:.1f}")
-        table.add_row("Avg Total (ms)", f"{avg_total:.1f}")
-        table.add_row("Effective Hz", f"{1000.0 / avg_total:.2f}" if avg_total > 0 else "0.00")
+            rows.append(("Frames Received", str(self.stats["frames_received"])))
+        # Stages overlap, so throughput is decisions per wall-clock second, not 1/latency
+        elapsed = (time.perf_counter_ns() - self._start_ns) / 1e9 if self._start_ns else 0.0
+        effective_hz = self.stats["iterations"] / elapsed if elapsed > 0 else 0.0
+        rows += [
+            ("Errors", str(self.stats["errors"])),
+            ("---", "---"),
+            ("Avg Capture (ms)", f"{avg_capture:.1f}"),
+            ("Avg Inference (ms)", f"{avg_inference:.1f}"),
+            ("Avg Send (ms)", f"{avg_send:.1f}"),
+            ("Avg Total (ms)", f"{avg_total:.1f}"),
+            ("Effective Hz", f"{effective_hz:.2f}"),
+        ]
 
         # Add latest state info if available
         if self.latest_state:
-            table.add_row("---", "---")
             player = self.latest_state.player
-            table.add_row("Position", f"({player.x:.1f}, {player.y:.1f}, {player.z:.1f})")
-            table.add_row("Health", f"{player.health:.1f}")
-            table.add_row("Hunger", f"{player.food:.1f}")
+            rows += [
+                ("---", "---"),
+                ("Position", f"({player.x:.1f}, {player.y:.1f}, {player.z:.1f})"),
+                ("Health", f"{player.health:.1f}"),
+                ("Hunger", f"{player.food:.1f}"),
+            ]
+
+        return rows
 
+    def _generate_stats_table(self) -> Table:
+        """Generate a stats table for display."""
+        table = Table(title="Agent Statistics", show_header=True)
+        table.add_column("Metric", style="cyan")
+        table.add_column("Value", style="green")
+        for metric, value in self._stats_rows():
+            table.add_row(metric, value)
         return table
 
     def _print_final_stats(self):
@@ -1,18 +1,37 @@
 """VLM policy for generating Minecraft actions from screenshots."""
 
-import base64
-import json
+import asyncio
+import copy
+import logging
+import re
 import time
-import traceback
-from collections import deque
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 
 import httpx
+import orjson
+from pydantic import ValidationError
 
+from .capture import JPEG_DATA_URL_PREFIX, b64encode, frame_digest
 from .config import Config
-from .protocol import ActionMessage
+from .protocol import ACTION_ADAPTER, ActionMessage
 
+logger = logging.getLogger(__name__)
+
+# HTTP/2 support for httpx over TLS (falls back to HTTP/1.1 keep-alive)
+try:
+    import h2  # noqa: F401
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+# Recent (frame, prompt) decisions kept for reuse
+ACTION_CACHE_SIZE = 512
+
+# Markdown code block around the JSON, with an optional language tag
+_CODE_FENCE_RE = re.compile(r"^\s*```[^\n]*\n(.*?)\s*```\s*$", re.DOTALL)
 
 # Directory for debug frame captures
 DEBUG_FRAMES_DIR = Path("./") / "mcagent_frames"
@@ -32,6 +51,10 @@ ACTION_SCHEMA_DESCRIPTION = """{
   "duration_ms": int (20-2000, how long to hold this action)
 }"""
 
+# Placeholders marking where the per-request fields go in the serialized payload
+_USER_TEXT_SLOT = "{{user_text}}"
+_IMAGE_URL_SLOT = "{{image_url}}"
+
 # Formal JSON schema for structured output
 ACTION_JSON_SCHEMA = {
     "name": "minecraft_action",
@@ -92,9 +115,15 @@ class VLMPolicy:
     def __init__(self, config: Config):
         """Initialize the VLM policy."""
         self.config = config
-        # NOTE: We deliberately avoid keeping a long-lived sync HTTP client here.
-        # The agent offloads inference to a worker thread, and httpx.Client is not
-        # guaranteed to be safe to use across threads.
+        # One pooled async client for every request: connections are kept alive
+        # between inferences and the event loop is never blocked on HTTP. httpx only
+        # negotiates HTTP/2 through TLS ALPN, so it is requested for https:// servers
+        # only (with h2 installed); plain http:// stays on HTTP/1.1 keep-alive.
+        self._client = httpx.AsyncClient(
+            http2=HAS_H2 and config.LLM_BASE_URL.startswith("https://"),
+            timeout=httpx.Timeout(30.0, connect=2.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
         self.system_prompt = f"""You are a Minecraft control policy. Given a screenshot of the current Minecraft world and goal, output ONLY a JSON action.
 
 Action schema:
@@ -107,87 +136,37 @@ Rules:
 - Set jump=true to jump, sprint=true to run faster
 - Use attack=true to break blocks or hit entities
 - Use use=true to place blocks or interact"""
-        self._last_inference_time = 0.0
-
-        # Ring buffer for last 5 frames (stores tuples of (timestamp, image_bytes))
-        self._frame_buffer: deque[tuple[float, bytes]] = deque(maxlen=5)
-        self._frame_counter = 0
-
-        # Ensure debug frames directory exists
-        DEBUG_FRAMES_DIR.mkdir(parents=True, exist_ok=True)
-        print(f"[Policy] Debug frames will be saved to: {DEBUG_FRAMES_DIR}")
-
-    def _save_frame_to_buffer(self, image_data_url: str) -> None:
-        """Extract image bytes from data URL and save to ring buffer."""
-        try:
-            # Parse data URL: "data:image/png;base64,<data>" or "data:image/jpeg;base64,<data>"
-            if not image_data_url.startswith("data:"):
-                return
-
-            # Extract the base64 part after the comma
-            comma_idx = image_data_url.find(",")
-            if comma_idx == -1:
-                return
-
-            b64_data = image_data_url[comma_idx + 1 :]
-            image_bytes = base64.b64decode(b64_data)
-
-            # Add to ring buffer with timestamp
-            self._frame_buffer.append((time.time(), image_bytes))
-            self._frame_counter += 1
-
-            # Save all frames in buffer to temp files
-            self._write_debug_frames()
-
-        except Exception as e:
-            print(f"[Policy] Error saving frame to buffer: {e}")
-
-    def _write_debug_frames(self) -> None:
-        """Write all frames in buffer to temp files."""
-        for i, (_timestamp, image_bytes) in enumerate(self._frame_buffer):
-            # Determine file extension from image header
-            ext = ".png" if image_bytes[:4] == b"\x89PNG" else ".jpg"
-            frame_path = DEBUG_FRAMES_DIR / f"frame_{i}{ext}"
-            frame_path.write_bytes(image_bytes)
-
-    def get_action(
-        self, image_data_url: str, goal: str, state: Optional[dict] = None
-    ) -> ActionMessage:
-        """
-        Get the next action from the VLM based on the current screenshot.
+        self._last_inference_ns = 0
 
-        Args:
-            image_data_url: Base64-encoded image data URL (PNG or JPEG)
-            goal: Current goal description
-            state: Optional state information from Minecraft
-
-        Returns:
-            ActionMessage with the next action to take
-        """
-        start = time.perf_counter()
+        # Recent decisions by (frame digest, user text), oldest first, for answering
+        # a repeated frame + prompt without a request
+        self._reuse_ttl_ns = config.vlm_reuse_ttl_ms * 1_000_000
+        self._action_cache: OrderedDict[tuple[int, str], tuple[int, ActionMessage]] = (
+            OrderedDict()
+        )
+        self.reused_actions = 0
 
-        # Save frame to debug buffer
-        self._save_frame_to_buffer(image_data_url)
+        # Last formatted user prompt and the goal/state it was built from
+        self._last_goal: Optional[str] = None
+        self._last_state: Optional[dict] = None
+        self._last_user_text = ""
 
-        # Build the user prompt
-        user_text = f"Goal: {goal}"
-        if state:
-            user_text += f"\nState: {json.dumps(state)}"
-
-        # Prepare the API request
+        # Everything but the user text and image URL is the same on every request,
+        # so the payload is serialized once and split around those two fields;
+        # each request only encodes the user text and image and joins the pieces.
         payload = {
-            "model": self.config.LLM_MODEL,
+            "model": config.LLM_MODEL,
             "messages": [
                 {"role": "system", "content": self.system_prompt},
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": user_text},
-                        {"type": "image_url", "image_url": {"url": image_data_url}},
+                        {"type": "text", "text": _USER_TEXT_SLOT},
+                        {"type": "image_url", "image_url": {"url": _IMAGE_URL_SLOT}},
                     ],
                 },
             ],
-            "max_tokens": self.config.max_new_tokens,
+            "max_tokens": config.max_new_tokens,
             "temperature": 0.0,
             "top_p": 1.0,
             "top_k": 0,
@@ -197,93 +176,266 @@ Rules:
                 "json_schema": ACTION_JSON_SCHEMA,
             },
         }
+        if config.vlm_stream:
+            payload["stream"] = True
+        template = orjson.dumps(payload)
+        self._payload_head, rest = template.split(orjson.dumps(_USER_TEXT_SLOT))
+        self._payload_middle, self._payload_tail = rest.split(orjson.dumps(_IMAGE_URL_SLOT))
+
+        if config.debug_frames:
+            # The directory is created on the first write
+            logger.info("Debug frames will be saved to: %s", DEBUG_FRAMES_DIR)
+
+    def _save_debug_frame(self, jpeg_bytes: bytes | memoryview) -> None:
+        """Write the frame sent to the VLM to disk (if enabled), off the event loop."""
+        if not self.config.debug_frames:
+            return
+        asyncio.get_running_loop().run_in_executor(
+            None, self._write_debug_frame, DEBUG_FRAMES_DIR / "frame_latest.jpg", jpeg_bytes
+        )
 
+    @staticmethod
+    def _write_debug_frame(frame_path: Path, jpeg_bytes: bytes | memoryview) -> None:
+        """Write one debug frame. Runs in the default executor."""
         try:
-            # print(f"[Policy] Request: {json.dumps(payload)}")
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
+            try:
+                frame_path.write_bytes(jpeg_bytes)
+            except FileNotFoundError:
+                frame_path.parent.mkdir(parents=True, exist_ok=True)
+                frame_path.write_bytes(jpeg_bytes)
+        except Exception as e:
+            logger.warning("Error saving debug frame: %s", e)
+
+    async def get_action(
+        self, jpeg_bytes: bytes | memoryview, goal: str, state: Optional[dict] = None
+    ) -> ActionMessage:
+        """
+        Get the next action from the VLM based on the current screenshot.
+
+        Args:
+            jpeg_bytes: JPEG-encoded screenshot; base64-encoded once, for the request
+            goal: Current goal description
+            state: Optional state information from Minecraft
+
+        Returns:
+            ActionMessage with the next action to take
+        """
+        start = time.perf_counter_ns()
+
+        # Save frame for debugging
+        self._save_debug_frame(jpeg_bytes)
+
+        # Build the user prompt (reused while goal and state are unchanged)
+        user_text = self._user_text(goal, state)
+
+        # Same frame and prompt as a recent decision: at temperature 0 the VLM would
+        # give the same answer, so skip the round trip
+        action_key = None
+        if self._reuse_ttl_ns:
+            action_key = (frame_digest(jpeg_bytes), user_text)
+            cached = self._action_cache.get(action_key)
+            if cached is not None and start - cached[0] < self._reuse_ttl_ns:
+                self._action_cache.move_to_end(action_key)
+                self.reused_actions += 1
+                self._last_inference_ns = time.perf_counter_ns() - start
+                return cached[1]
+
+        # Splice the request body together. The OpenAI-style API only takes images
+        # as URLs; this is the one base64 pass. A data URL needs no JSON escaping.
+        body = b"".join(
+            [
+                self._payload_head,
+                orjson.dumps(user_text),
+                self._payload_middle,
+                b'"',
+                JPEG_DATA_URL_PREFIX,
+                b64encode(memoryview(jpeg_bytes)),
+                b'"',
+                self._payload_tail,
+            ]
+        )
+
+        try:
+            if self.config.vlm_stream:
+                content = await self._stream_content(body)
+            else:
+                response = await self._client.post(
                     f"{self.config.LLM_BASE_URL}/chat/completions",
-                    json=payload,
+                    content=body,
+                    headers={"Content-Type": "application/json"},
                 )
-            response.raise_for_status()
-            result = response.json()
+                response.raise_for_status()
+                result = orjson.loads(response.content)
 
-            # Extract the content
-            content = result["choices"][0]["message"]["content"]
-            print(f"[Policy] LLM response content: {content}")
+                # Extract the content
+                content = result["choices"][0]["message"]["content"]
+            logger.debug("LLM response content: %s", content)
 
             # Parse the JSON action
-            action_dict = self._parse_action_json(content)
-            action = self._dict_to_action(action_dict)
+            action = self._content_to_action(content)
 
-            self._last_inference_time = time.perf_counter() - start
+            if action_key is not None:
+                self._cache_action(action_key, start, action)
+            self._last_inference_ns = time.perf_counter_ns() - start
             return action
 
         except httpx.HTTPStatusError as e:
-            self._last_inference_time = time.perf_counter() - start
-            print(f"[Policy] HTTP error: {e}")
-            print(f"[Policy] Response body: {e.response.text}")
-            traceback.print_exc()
+            self._last_inference_ns = time.perf_counter_ns() - start
+            logger.error("HTTP error: %s; response body: %s", e, e.response.text)
             # Return a safe default action (do nothing)
             return self._get_default_action()
 
         except Exception as e:
-            self._last_inference_time = time.perf_counter() - start
-            print(f"[Policy] Error: {e}")
-            traceback.print_exc()
+            self._last_inference_ns = time.perf_counter_ns() - start
+            logger.exception("Error getting action: %s", e)
             # Return a safe default action (do nothing)
             return self._get_default_action()
 
+    def _user_text(self, goal: str, state: Optional[dict]) -> str:
+        """Format the user prompt, reusing the last one if goal and state match."""
+        if goal == self._last_goal and state == self._last_state:
+            return self._last_user_text
+
+        user_text = f"Goal: {goal}"
+        if state:
+            user_text += f"\nState: {orjson.dumps(state).decode()}"
+        # Deep copy so in-place edits by the caller, including to nested values,
+        # still register as a change (a shallow copy would share them)
+        self._last_goal, self._last_state = goal, copy.deepcopy(state)
+        self._last_user_text = user_text
+        return user_text
+
+    async def _stream_content(self, body: bytes) -> str:
+        """
+        Stream a chat completion and return its content once the JSON object closes.
+
+        The response is closed as soon as the braces balance, which makes the server
+        abort the request instead of decoding trailing tokens (e.g. the whitespace
+        some guided-decoding backends emit until max_tokens). Closing mid-response
+        discards the connection on HTTP/1.1, so this is opt-in (VLM_STREAM=1).
+        """
+        parts = []
+        depth = 0
+        opened = False
+        async with self._client.stream(
+            "POST",
+            f"{self.config.LLM_BASE_URL}/chat/completions",
+            content=body,
+            headers={"Content-Type": "application/json"},
+        ) as response:
+            if response.is_error:
+                # Read the body so the HTTP error handler can log it
+                await response.aread()
+            response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                # Server-sent events: "data: {chunk}" lines, ending with "data: [DONE]"
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = orjson.loads(data)["choices"]
+                delta = choices[0]["delta"].get("content") if choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                opens = delta.count("{")
+                opened = opened or opens > 0
+                depth += opens - delta.count("}")
+                if opened and depth <= 0:
+                    break
+
+        return "".join(parts)
+
+    async def get_actions_batch(
+        self, frames: list[bytes | memoryview], goal: str, state: Optional[dict] = None
+    ) -> list[ActionMessage]:
+        """
+        Get actions for several screenshots at once.
+
+        The OpenAI-compatible chat endpoint takes one conversation per request, so the
+        requests are issued concurrently and the VLM server batches them on its side.
+
+        Args:
+            frames: JPEG-encoded screenshots
+            goal: Current goal description
+            state: Optional state information from Minecraft
+
+        Returns:
+            One ActionMessage per image, in the same order
+        """
+        if len(frames) == 1:
+            return [await self.get_action(frames[0], goal, state)]
+
+        start = time.perf_counter_ns()
+        actions = await asyncio.gather(*(self.get_action(frame, goal, state) for frame in frames))
+        self._last_inference_ns = time.perf_counter_ns() - start
+        return actions
+
+    def _cache_action(self, key: tuple[int, str], decided_ns: int, action: ActionMessage):
+        """Remember a decision for reuse, evicting the least recently used one."""
+        self._action_cache[key] = (decided_ns, action)
+        self._action_cache.move_to_end(key)
+        if len(self._action_cache) > ACTION_CACHE_SIZE:
+            self._action_cache.popitem(last=False)
+
+    def _content_to_action(self, content: str) -> ActionMessage:
+        """
+        Parse and validate the action in a VLM response.
+
+        Schema-conforming output is parsed and validated in a single pydantic-core
+        pass with no intermediate dict; anything else goes through the lenient parser.
+        """
+        try:
+            action = ACTION_ADAPTER.validate_json(content)
+        except ValidationError:
+            return self._dict_to_action(self._parse_action_json(content))
+        if "duration_ms" not in action.model_fields_set:
+            action.duration_ms = self.config.action_duration_ms_default
+        return action
+
     def _parse_action_json(self, content: str) -> dict:
         """
         Parse JSON from the VLM response.
 
-        Handles cases where the model might wrap JSON in markdown code blocks.
+        With the json_schema response format the content is plain JSON and parses
+        in one go; otherwise handles the model wrapping JSON in markdown code blocks.
         """
-        content = content.strip()
-
-        # Remove markdown code blocks if present
-        if content.startswith("```"):
-            lines = content.split("\n")
-            # Remove first and last lines (code fence markers)
-            if lines[0].startswith("```"):
-                lines = lines[1:]
-            if lines and lines[-1].startswith("```"):
-                lines = lines[:-1]
-            content = "\n".join(lines)
-
-        # Try to find JSON content
         try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            # Try to extract JSON from text
-            start_idx = content.find("{")
-            end_idx = content.rfind("}")
-            if start_idx != -1 and end_idx != -1:
-                json_str = content[start_idx : end_idx + 1]
-                return json.loads(json_str)
-            raise
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+
+        # Unwrap a markdown code block if present
+        fence = _CODE_FENCE_RE.match(content)
+        if fence:
+            content = fence.group(1)
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass
+
+        # Try to extract JSON from text
+        start_idx = content.find("{")
+        end_idx = content.rfind("}")
+        if start_idx != -1 and end_idx != -1:
+            content = content[start_idx : end_idx + 1]
+        return orjson.loads(content)
 
     def _dict_to_action(self, action_dict: dict) -> ActionMessage:
-        """Convert a dictionary to an ActionMessage with validation."""
-        return ActionMessage(
-            forward=float(action_dict.get("forward", 0.0)),
-            strafe=float(action_dict.get("strafe", 0.0)),
-            yaw=float(action_dict.get("yaw", 0.0)),
-            pitch=float(action_dict.get("pitch", 0.0)),
-            jump=bool(action_dict.get("jump", False)),
-            attack=bool(action_dict.get("attack", False)),
-            use=bool(action_dict.get("use", False)),
-            sneak=bool(action_dict.get("sneak", False)),
-            sprint=bool(action_dict.get("sprint", False)),
-            duration_ms=int(
-                action_dict.get("duration_ms", self.config.action_duration_ms_default)
-            ),
-        )
+        """
+        Convert a dictionary to an ActionMessage with validation.
+
+        The whole dict is validated in one pydantic-core call. Range checks still
+        apply since the response schema only enforces types, not bounds.
+        """
+        action_dict.setdefault("duration_ms", self.config.action_duration_ms_default)
+        return ACTION_ADAPTER.validate_python(action_dict)
 
     def _get_default_action(self) -> ActionMessage:
-        """Get a safe default action (do nothing)."""
-        return ActionMessage(
+        """Get a safe default action (do nothing). Known-good, so validation is skipped."""
+        return ActionMessage.model_construct(
             forward=0.0,
             strafe=0.0,
             yaw=0.0,
@@ -296,11 +448,14 @@ Rules:
             duration_ms=self.config.action_duration_ms_default,
         )
 
+    def get_last_inference_time_ns(self) -> int:
+        """Get the time taken for the last inference in nanoseconds."""
+        return self._last_inference_ns
+
     def get_last_inference_time_ms(self) -> float:
         """Get the time taken for the last inference in milliseconds."""
-        return self._last_inference_time * 1000
+        return self._last_inference_ns * 1e-6
 
-    def close(self):
+    async def close(self):
         """Close the HTTP client."""
-        # No-op: we create a short-lived httpx.Client per request for thread safety.
-        return
+        await self._client.aclose()
@@ -1,7 +1,7 @@
 """WebSocket protocol message schemas for Minecraft bridge communication."""
 
-from typing import Literal, Optional
-from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class ActionMessage(BaseModel):
@@ -87,3 +87,18 @@ class StateMessage(BaseModel):
 
 # Union type for all message types
 Message = HelloMessage | ActionMessage | AckMessage | StateMessage
+
+
+# Text messages the agent consumes from the bridge, told apart by "type"
+InboundMessage = Annotated[AckMessage | StateMessage, Field(discriminator="type")]
+
+
+# Compiled validators/serializers, built once and shared by every caller
+ACTION_ADAPTER = TypeAdapter(ActionMessage)
+# Parses and validates raw JSON in a single pydantic-core pass, no intermediate dict
+INBOUND_ADAPTER = TypeAdapter(InboundMessage)
+
+
+def encode_action(action: ActionMessage) -> bytes:
+    """Serialize an action straight to UTF-8 JSON bytes for the bridge."""
+    return ACTION_ADAPTER.dump_json(action)
@@ -0,0 +1,76 @@
+"""Tests for window region tracking in the capture module."""
+
+import threading
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("mss")
+
+from mcagent import capture
+from mcagent.capture import WINDOW_REGION_TTL_S, ScreenCapture
+
+FIRST_REGION = {"left": 0, "top": 0, "width": 854, "height": 480}
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only advances when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_spied_capture(monkeypatch, regions: list[dict]) -> ScreenCapture:
+    """
+    A window-mode ScreenCapture with the xprop spy running.
+
+    Built without __init__ so no display is needed; window lookups return
+    `regions` in order.
+    """
+    screen = ScreenCapture.__new__(ScreenCapture)
+    screen.window_title = "Minecraft"
+    screen._window_region = None
+    screen._pywinctl_window = None
+    screen._watching_window = False
+    screen._window_region_checked = 0.0
+    screen._xprop = object()
+    screen._window_list_changed = threading.Event()
+    lookups = iter(regions)
+    monkeypatch.setattr(screen, "_find_window_region", lambda: next(lookups))
+    return screen
+
+
+def test_window_move_refreshes_region_while_spy_is_active(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(capture.time, "monotonic", clock)
+    moved = {"left": 200, "top": 150, "width": 854, "height": 480}
+    screen = make_spied_capture(monkeypatch, [FIRST_REGION, moved])
+
+    screen._update_window_region()
+    assert screen._window_region == FIRST_REGION
+
+    # A move changes neither the window list nor focus, so the spy stays quiet
+    clock.now += WINDOW_REGION_TTL_S / 2
+    screen._update_window_region()
+    assert screen._window_region == FIRST_REGION
+
+    clock.now += WINDOW_REGION_TTL_S / 2
+    screen._update_window_region()
+    assert screen._window_region == moved
+
+
+def test_spy_event_refreshes_region_before_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(capture.time, "monotonic", clock)
+    refocused = {"left": 40, "top": 30, "width": 1280, "height": 720}
+    screen = make_spied_capture(monkeypatch, [FIRST_REGION, refocused])
+
+    screen._update_window_region()
+    screen._window_list_changed.set()
+    screen._update_window_region()
+
+    assert screen._window_region == refocused
+    assert not screen._window_list_changed.is_set()